@@ -0,0 +1,665 @@
+#!/usr/bin/env python3
+
+"""
+----------------------------------------------------------------------------
+Authors:     FRC Team 4145
+
+Description: Benchmarks for the vision pipeline.  Run with the name of the
+             benchmark, e.g. "python3 benchmark.py filter".
+
+Comments:    This script does not need a camera or NetworkTables and can be
+             run on a development computer or on the Raspberry Pi.
+----------------------------------------------------------------------------
+"""
+
+import argparse
+import datetime
+import json
+import math
+import os
+import resource
+import subprocess
+import time
+import cv2
+import numpy
+from vision import (ComponentDetector, Connection, Constants, ContourFilter, FileFrameSource, Logger, Pipeline,
+                    PipelineGraph, PyramidDetector, RawFrameSource, StageTimer, TargetSet, TargetTracker,
+                    VisionProcessor)
+
+
+def createBlobImage(blob_count, width=640, height=480, seed=0):
+    """
+    Create a binary image containing a few target sized blobs among many
+    small noise blobs.
+    """
+
+    random = numpy.random.RandomState(seed)
+    image = numpy.zeros((height, width), dtype=numpy.uint8)
+
+    for i in range(blob_count):
+        x = int(random.randint(0, width))
+        y = int(random.randint(0, height))
+        if (random.rand() < 0.05):
+            # Target sized blob
+            size = (int(random.randint(5, 30)), int(random.randint(10, 40)))
+            cv2.rectangle(image, (x, y), (x + size[0], y + size[1]), 255, -1)
+        else:
+            # Small noise blob
+            axes = (int(random.randint(0, 4)), int(random.randint(0, 6)))
+            cv2.ellipse(image, (x, y), axes, float(random.randint(0, 180)), 0, 360, 255, -1)
+
+    return image
+
+
+def createNoiseImage(speck_count, width=640, height=480, seed=0):
+    """
+    Create a binary image containing four targets and many small noise specks.
+    """
+
+    random = numpy.random.RandomState(seed)
+    image = numpy.zeros((height, width), dtype=numpy.uint8)
+
+    for i in range(speck_count):
+        center = (int(random.randint(0, width)), int(random.randint(0, height)))
+        cv2.circle(image, center, int(random.randint(0, 3)), 255, -1)
+
+    for i in range(4):
+        x = width // 5 * (i + 1)
+        cv2.rectangle(image, (x, height // 2), (x + 20, height // 2 + 40), 255, -1)
+
+    return image
+
+
+def timeCall(function, repeat):
+    """
+    Return the average time (seconds) of calling function repeat times.
+    """
+
+    start = time.perf_counter()
+    for i in range(repeat):
+        function()
+
+    return (time.perf_counter() - start) / repeat
+
+
+def filterParams(pipeline):
+    """
+    Filter contours parameters of a pipeline, in the order of filter_contours.
+    """
+
+    return (pipeline.filter_contours_min_area, pipeline.filter_contours_min_perimeter,
+            pipeline.filter_contours_min_width, pipeline.filter_contours_max_width,
+            pipeline.filter_contours_min_height, pipeline.filter_contours_max_height,
+            pipeline.filter_contours_solidity, pipeline.filter_contours_max_vertices,
+            pipeline.filter_contours_min_vertices, pipeline.filter_contours_min_ratio,
+            pipeline.filter_contours_max_ratio)
+
+
+def benchmarkFilter(args):
+    """
+    Compare Pipeline.filter_contours against the vectorized ContourFilter.
+    """
+
+    pipeline = Pipeline()
+    params = filterParams(pipeline)
+
+    print("{:>10} {:>10} {:>12} {:>12} {:>8}".format("blobs", "contours", "loop (ms)", "vector (ms)", "speedup"))
+    for blob_count in args.blobs:
+        image = createBlobImage(blob_count)
+        contours = Pipeline.find_contours(image, False)
+
+        expected = Pipeline.filter_contours(contours, *params)
+        actual = ContourFilter.filter(contours, *params)
+        if (len(expected) != len(actual) or any(a is not b for (a, b) in zip(expected, actual))):
+            raise AssertionError("ContourFilter output differs from filter_contours")
+
+        loop_time = timeCall(lambda: Pipeline.filter_contours(contours, *params), args.repeat)
+        vector_time = timeCall(lambda: ContourFilter.filter(contours, *params), args.repeat)
+
+        print("{:>10} {:>10} {:>12.3f} {:>12.3f} {:>7.1f}x".format(
+            blob_count, len(contours), loop_time * 1000, vector_time * 1000, loop_time / vector_time))
+
+
+def contourKey(contour):
+    """
+    Hashable key used to compare contours regardless of order.
+    """
+
+    return contour.tobytes()
+
+
+def benchmarkDetection(args):
+    """
+    Compare the findContours and connected-components detection backends.
+    """
+
+    pipeline = Pipeline()
+    params = filterParams(pipeline)
+
+    def detectContours(image):
+        contours = Pipeline.find_contours(image, pipeline.find_contours_external_only)
+        return Pipeline.filter_contours(contours, *params)
+
+    def detectComponents(image):
+        contours = pipeline.find_component_contours(image, pipeline.find_contours_external_only)
+        return Pipeline.filter_contours(contours, *params)
+
+    print("{:>10} {:>10} {:>14} {:>16} {:>8}".format("specks", "contours", "contours (ms)", "components (ms)", "speedup"))
+    for speck_count in args.specks:
+        image = createNoiseImage(speck_count)
+
+        # The published results depend on the order as well as the contours
+        expected = list(map(contourKey, detectContours(image)))
+        actual = list(map(contourKey, detectComponents(image)))
+        if (expected != actual):
+            raise AssertionError("Connected-components backend output differs from findContours")
+
+        contour_time = timeCall(lambda: detectContours(image), args.repeat)
+        component_time = timeCall(lambda: detectComponents(image), args.repeat)
+
+        print("{:>10} {:>10} {:>14.3f} {:>16.3f} {:>7.1f}x".format(
+            speck_count, len(Pipeline.find_contours(image, False)), contour_time * 1000, component_time * 1000,
+            contour_time / component_time))
+
+
+def getCommit():
+    """
+    Get the git commit of the working tree, if available.
+    """
+
+    try:
+        output = subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL,
+                                         cwd=os.path.dirname(os.path.abspath(__file__)))
+        return output.decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def benchmarkReplay(args):
+    """
+    Drive Pipeline and VisionProcessor through recorded frames without a
+    camera or NetworkTables.
+    """
+
+    frames = FileFrameSource.loadFrames(args.path, args.limit)
+    if (len(frames) == 0):
+        raise SystemExit("No frames found in " + args.path)
+
+    # Report the time of each stage
+    Constants.ENABLE_STAGE_TIMING = True
+    vision_processor = VisionProcessor(Logger(None), None, None)
+    pipeline = vision_processor.pipeline
+
+    # Warm up buffers and caches
+    for frame in frames[:args.warmup]:
+        vision_processor.processFrame(frame, pipeline)
+
+    if (vision_processor.timer is not None):
+        vision_processor.timer.reset()
+
+    latencies = []
+    contour_count = 0
+    start = time.perf_counter()
+    for i in range(args.repeat):
+        for frame in frames:
+            frame_start = time.perf_counter()
+            contour_data = vision_processor.processFrame(frame, pipeline)
+            latencies.append(time.perf_counter() - frame_start)
+            contour_count += len(contour_data)
+    elapsed = time.perf_counter() - start
+
+    latencies = numpy.array(latencies) * 1000
+    (p50, p95, p99) = numpy.percentile(latencies, [50, 95, 99])
+
+    stages = {}
+    if (vision_processor.timer is not None):
+        for (stage, (count, s50, s95, s99, smax)) in vision_processor.timer.summary().items():
+            stages[stage] = {"p50_ms": s50, "p95_ms": s95, "p99_ms": s99, "max_ms": smax}
+
+    (height, width) = frames[0].shape[:2]
+    results = {
+        "commit": getCommit(),
+        "time": datetime.datetime.now().isoformat(),
+        "source": args.path,
+        "frames": len(latencies),
+        "resolution": [width, height],
+        "fps": len(latencies) / elapsed,
+        "latency_ms": {"mean": float(latencies.mean()), "p50": p50, "p95": p95, "p99": p99,
+                       "max": float(latencies.max())},
+        "stages": stages,
+        "contours_per_frame": contour_count / len(latencies),
+        # ru_maxrss is in kilobytes on Linux
+        "peak_memory_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0,
+        "settings": {name: getattr(Constants, name) for name in dir(Constants) if name.isupper()},
+    }
+
+    print("{} frames at {}x{}: {:.1f} fps, latency p50 {:.2f} ms, p95 {:.2f} ms, p99 {:.2f} ms, peak memory {:.1f} MB".format(
+        results["frames"], width, height, results["fps"], p50, p95, p99, results["peak_memory_mb"]))
+    for (stage, values) in stages.items():
+        print("  {:<22} p50 {:7.3f} ms  p95 {:7.3f} ms  max {:7.3f} ms".format(stage, values["p50_ms"], values["p95_ms"], values["max_ms"]))
+
+    if (args.output is not None):
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2, default=float)
+        print("Saved results to " + args.output)
+
+
+def createRawFile(args):
+    """
+    Convert recorded images or a video into a raw frame file for load tests.
+    """
+
+    frames = FileFrameSource.loadFrames(args.path, args.limit)
+    if (len(frames) == 0):
+        raise SystemExit("No frames found in " + args.path)
+
+    (height, width) = frames[0].shape[:2]
+    frames = [frame for frame in frames if frame.shape[:2] == (height, width)]
+    RawFrameSource.writeRawFile(args.output, frames)
+
+    print("Wrote {} frames of {}x{} to {}".format(len(frames), width, height, args.output))
+
+
+def benchmarkLoad(args):
+    """
+    Run the full processing loop (VisionProcessor.processVision) from a file
+    or raw frame source for a fixed time.
+    """
+
+    if (args.width is not None and args.height is not None):
+        frame_source = RawFrameSource(args.path, args.width, args.height, args.fps)
+    else:
+        frame_source = FileFrameSource(args.path, args.fps)
+
+    logger = Logger(None)
+    connection = Connection(logger, False, 0)
+    Constants.ENABLE_STAGE_TIMING = True
+    vision_processor = VisionProcessor(logger, connection, None, frame_source)
+
+    frame_count = 0
+    start = time.perf_counter()
+    while (time.perf_counter() - start < args.seconds):
+        vision_processor.processVision()
+        frame_count += 1
+    elapsed = time.perf_counter() - start
+
+    print("{} frames in {:.1f} s: {:.1f} fps".format(frame_count, elapsed, frame_count / elapsed))
+    if (vision_processor.timer is not None):
+        for (stage, (count, p50, p95, p99, maximum)) in vision_processor.timer.summary().items():
+            print("  {:<22} p50 {:7.3f} ms  p95 {:7.3f} ms  max {:7.3f} ms".format(stage, p50, p95, maximum))
+
+    frame_source.close()
+
+
+def createTargetFrame(width, height, seed=0):
+    """
+    Create a BGR frame with dark noise, a large bright wall and a few
+    target sized green rectangles.
+    """
+
+    random = numpy.random.RandomState(seed)
+    frame = random.randint(0, 60, (height, width, 3)).astype(numpy.uint8)
+
+    cv2.rectangle(frame, (0, 0), (width // 4, height // 4), (0, 200, 0), -1)
+    for i in range(4):
+        x = width // 5 * (i + 1)
+        cv2.rectangle(frame, (x, height // 2), (x + 20, height // 2 + 40), (0, 200, 0), -1)
+
+    return frame
+
+
+def createClutterFrame(width, height, seed=0):
+    """
+    Create a target frame where the wall has dark holes and some targets are
+    close to the minimum size of the contour filter.
+    """
+
+    random = numpy.random.RandomState(seed)
+    frame = createTargetFrame(width, height, seed)
+
+    (left, top, right, bottom) = (width // 2, height // 10, width - width // 20, height // 2 - height // 10)
+    cv2.rectangle(frame, (left, top), (right, bottom), (0, 200, 0), -1)
+    for i in range(30):
+        x = random.randint(left, right - 10)
+        y = random.randint(top, bottom - 20)
+        cv2.rectangle(frame, (x, y), (x + random.randint(3, 8), y + random.randint(8, 20)), (0, 0, 0), -1)
+
+    for i in range(10):
+        x = random.randint(0, width - 10)
+        y = random.randint(height // 2 + height // 20, height - 20)
+        cv2.rectangle(frame, (x, y), (x + random.randint(3, 7), y + random.randint(8, 14)), (0, 200, 0), -1)
+
+    return frame
+
+
+def benchmarkPyramid(args):
+    """
+    Compare full-resolution detection with coarse-to-fine detection.
+    """
+
+    pipeline = Pipeline()
+
+    frames = None
+    if (args.path is not None):
+        frames = FileFrameSource.loadFrames(args.path, 1)
+
+    print("{:>10} {:>6} {:>10} {:>13} {:>10} {:>8} {:>6}".format(
+        "size", "scale", "full (ms)", "pyramid (ms)", "touched %", "speedup", "match"))
+    for size in args.sizes:
+        (width, height) = [int(value) for value in size.split("x")]
+        if (frames):
+            frame = cv2.resize(frames[0], (width, height))
+        else:
+            frame = createTargetFrame(width, height)
+
+        pipeline.process(frame)
+        expected = sorted(map(contourKey, pipeline.filter_contours_output))
+        full_time = timeCall(lambda: pipeline.process(frame), args.repeat)
+
+        for scale in args.scales:
+            detector = PyramidDetector(Logger(None), scale)
+            detector.process(frame, pipeline)
+            actual = sorted(map(contourKey, pipeline.filter_contours_output))
+            pyramid_time = timeCall(lambda: detector.process(frame, pipeline), args.repeat)
+            touched = detector.touched_fraction
+
+            # Holes in large blobs and targets near the minimum size must be found too
+            for seed in range(args.seeds):
+                clutter = createClutterFrame(width, height, seed)
+                pipeline.process(clutter)
+                clutter_expected = sorted(map(contourKey, pipeline.filter_contours_output))
+                detector.process(clutter, pipeline)
+                if (sorted(map(contourKey, pipeline.filter_contours_output)) != clutter_expected):
+                    raise AssertionError("Coarse-to-fine detection differs from full resolution "
+                                         "({} scale {} seed {})".format(size, scale, seed))
+
+            print("{:>10} {:>6} {:>10.3f} {:>13.3f} {:>10.1f} {:>7.1f}x {:>6}".format(
+                size, scale, full_time * 1000, pyramid_time * 1000, 100.0 * touched,
+                full_time / pyramid_time, "yes" if (expected == actual) else "no"))
+
+
+def benchmarkGraph(args):
+    """
+    Compare the step graph before and after optimization.
+    """
+
+    pipeline = Pipeline()
+    graph = PipelineGraph.load(args.graph)
+    graph.applyParams(pipeline)
+
+    if (args.path is not None):
+        frames = FileFrameSource.loadFrames(args.path, args.limit)
+    else:
+        frames = [createTargetFrame(640, 480, seed) for seed in range(10)]
+
+    expected = None
+    for (name, optimize) in (("before", False), ("after", True)):
+        program = graph.compile(pipeline, optimize)
+        timer = StageTimer(args.repeat * len(frames), 0)
+
+        outputs = []
+        for frame in frames:
+            outputs.append(sorted(map(contourKey, pipeline.filter_contours(program.run(frame), *filterParams(pipeline)))))
+        if (expected is None):
+            expected = outputs
+        elif (outputs != expected):
+            raise AssertionError("Optimized graph output differs from the original graph")
+
+        for i in range(args.repeat):
+            for frame in frames:
+                program.run(frame, timer)
+
+        summary = timer.summary()
+        total = 0.0
+        print("{} optimization ({} buffers):".format(name, program.buffer_count))
+        for (label, description) in program.describe():
+            p50 = summary[label][1]
+            total += p50
+            print("  {:<24} {:<48} {:>8.3f} ms".format(label, description, p50))
+        print("  {:<24} {:<48} {:>8.3f} ms".format("total", "", total))
+
+
+def createMovingFrames(frame_count, width=640, height=480):
+    """
+    Create a sequence of target frames with the targets moving smoothly.
+    """
+
+    background = createTargetFrame(width, height)
+    background[:, :] = numpy.random.RandomState(1).randint(0, 60, (height, width, 3))
+
+    frames = []
+    for i in range(frame_count):
+        frame = background.copy()
+        dx = int(60 * math.sin(i / 15.0))
+        dy = int(30 * math.cos(i / 20.0))
+        for j in range(4):
+            x = width // 5 * (j + 1) + dx
+            cv2.rectangle(frame, (x, height // 2 + dy), (x + 20, height // 2 + dy + 40), (0, 200, 0), -1)
+        frame.flags.writeable = False
+        frames.append(frame)
+
+    return frames
+
+
+def centroidErrors(expected, actual):
+    """
+    Distance from each expected centroid to the nearest actual centroid
+    (None when a target is missing).
+    """
+
+    errors = []
+    for contour in expected:
+        if (len(actual) == 0):
+            errors.append(None)
+            continue
+        errors.append(min(math.hypot(contour.cx - other.cx, contour.cy - other.cy) for other in actual))
+
+    return errors
+
+
+def benchmarkTracking(args):
+    """
+    Compare detecting every frame with detecting every N frames and tracking
+    the targets in between.
+    """
+
+    if (args.path is not None):
+        frames = FileFrameSource.loadFrames(args.path, args.limit)
+    else:
+        (width, height) = [int(value) for value in args.size.split("x")]
+        frames = createMovingFrames(args.limit, width, height)
+
+    logger = Logger(None)
+    connection = Connection(logger, False, 0)
+    Constants.ENABLE_TARGET_TRACKING = True
+    vision_processor = VisionProcessor(logger, connection, None)
+    vision_processor.timer = None
+    pipeline = vision_processor.pipeline
+    pipeline.timer = None
+
+    start = time.perf_counter()
+    expected = [vision_processor.processFrame(frame, pipeline) for frame in frames]
+    detect_time = (time.perf_counter() - start) / len(frames)
+
+    print("{:>9} {:>9} {:>10} {:>10} {:>10} {:>9} {:>10} {:>8}".format(
+        "interval", "tracked", "mean (px)", "p95 (px)", "max (px)", "missed", "frame (ms)", "speedup"))
+    print("{:>9} {:>9} {:>10} {:>10} {:>10} {:>9} {:>10.3f} {:>8}".format(
+        1, "0.0%", "-", "-", "-", "-", detect_time * 1000, "1.0x"))
+
+    for interval in args.intervals:
+        Constants.TRACK_DETECT_INTERVAL = interval
+        vision_processor.target_tracker = TargetTracker(logger)
+
+        actual = []
+        start = time.perf_counter()
+        for (sequence, frame) in enumerate(frames):
+            actual.append(vision_processor.processTrackedTargets(frame, pipeline, 0, sequence))
+        track_time = (time.perf_counter() - start) / len(frames)
+
+        errors = []
+        tracked = 0
+        for (expected_data, actual_data) in zip(expected, actual):
+            errors.extend(centroidErrors(expected_data, actual_data))
+            if (len(actual_data) > 0 and actual_data[0].tracked):
+                tracked += 1
+        missed = len([error for error in errors if (error is None)])
+        errors = numpy.array([error for error in errors if (error is not None)] or [0.0])
+
+        print("{:>9} {:>8.1f}% {:>10.2f} {:>10.2f} {:>10.2f} {:>9} {:>10.3f} {:>7.1f}x".format(
+            interval, 100.0 * tracked / len(frames), errors.mean(), numpy.percentile(errors, 95), errors.max(),
+            missed, track_time * 1000, detect_time / track_time))
+
+
+def createMultiTargetFrame(width, height, seed=0):
+    """
+    Create a target frame that also has a few orange balls.
+    """
+
+    frame = createTargetFrame(width, height, seed)
+    for i in range(3):
+        center = (width // 4 * (i + 1), height // 5 + 10 * seed)
+        cv2.circle(frame, center, max(width // 40, 4), (0, 120, 255), -1)
+
+    return frame
+
+
+def benchmarkTargets(args):
+    """
+    Compare finding one target type, several target types with independent
+    pipelines and several target types sharing the frame intermediates.
+    """
+
+    if (args.path is not None):
+        frames = FileFrameSource.loadFrames(args.path, args.limit)
+    else:
+        (width, height) = [int(value) for value in args.size.split("x")]
+        frames = [createMultiTargetFrame(width, height, seed) for seed in range(args.limit)]
+
+    detector = None
+    if (args.pyramid > 1):
+        detector = PyramidDetector(Logger(None), args.pyramid)
+
+    pipeline = Pipeline()
+    target_set = TargetSet(Logger(None), None, pipeline)
+    for (name, values) in TargetSet.loadTargets(args.targets):
+        target_set.addTarget(name, values)
+    pipelines = [pipeline] + [target.pipeline for target in target_set.targets]
+    cache = target_set.frame_cache
+
+    def processFrame(frame, pipelines, shared):
+        if (shared):
+            cache.reset()
+        for pipeline in pipelines:
+            pipeline.frame_cache = cache if (shared) else None
+            if (detector is not None):
+                detector.process(frame, pipeline)
+            else:
+                pipeline.process(frame)
+
+        return [sorted(map(contourKey, pipeline.filter_contours_output)) for pipeline in pipelines]
+
+    def timeFrames(pipelines, shared):
+        start = time.perf_counter()
+        for i in range(args.repeat):
+            for frame in frames:
+                processFrame(frame, pipelines, shared)
+
+        return (time.perf_counter() - start) / (args.repeat * len(frames))
+
+    expected = [processFrame(frame, pipelines, False) for frame in frames]
+    actual = [processFrame(frame, pipelines, True) for frame in frames]
+    if (actual != expected):
+        raise AssertionError("Shared intermediates changed the detected targets")
+
+    single_time = timeFrames(pipelines[:1], False)
+    independent_time = timeFrames(pipelines, False)
+    (cache.computed, cache.reused) = (0, 0)
+    shared_time = timeFrames(pipelines, True)
+
+    extra_count = len(pipelines) - 1
+    print("{} target types ({}), {} frames".format(
+        len(pipelines), ", ".join(["main"] + [target.name for target in target_set.targets]), len(frames)))
+    print("{:<12} {:>10} {:>20} {:>12}".format("pipelines", "frame (ms)", "per extra type (ms)", "of a full"))
+    print("{:<12} {:>10.3f} {:>20} {:>12}".format("single", single_time * 1000, "-", "-"))
+    for (name, frame_time) in (("independent", independent_time), ("shared", shared_time)):
+        extra_time = (frame_time - single_time) / max(extra_count, 1)
+        print("{:<12} {:>10.3f} {:>20.3f} {:>11.0f}%".format(name, frame_time * 1000, extra_time * 1000,
+                                                            100.0 * extra_time / single_time))
+    print("Shared intermediates: {:.1f} computed and {:.1f} reused per frame".format(
+        cache.computed / float(args.repeat * len(frames)), cache.reused / float(args.repeat * len(frames))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vision pipeline benchmarks")
+    subparsers = parser.add_subparsers(dest="benchmark")
+    subparsers.required = True
+
+    filter_parser = subparsers.add_parser("filter", help="contour filter loop vs vectorized")
+    filter_parser.add_argument("--blobs", type=int, nargs="+", default=[10, 50, 100, 250, 500, 1000])
+    filter_parser.add_argument("--repeat", type=int, default=50)
+    filter_parser.set_defaults(run=benchmarkFilter)
+
+    detection_parser = subparsers.add_parser("detection", help="findContours vs connected components")
+    detection_parser.add_argument("--specks", type=int, nargs="+", default=[0, 100, 500, 1000, 3000, 6000])
+    detection_parser.add_argument("--repeat", type=int, default=50)
+    detection_parser.set_defaults(run=benchmarkDetection)
+
+    replay_parser = subparsers.add_parser("replay", help="process recorded frames (image directory or video)")
+    replay_parser.add_argument("path", help="directory of recorded images or a video file")
+    replay_parser.add_argument("--output", help="save the results as JSON to this file")
+    replay_parser.add_argument("--repeat", type=int, default=1, help="number of passes over the frames")
+    replay_parser.add_argument("--warmup", type=int, default=5, help="frames processed before timing")
+    replay_parser.add_argument("--limit", type=int, help="maximum number of frames to load")
+    replay_parser.set_defaults(run=benchmarkReplay)
+
+    pyramid_parser = subparsers.add_parser("pyramid", help="full-resolution vs coarse-to-fine detection")
+    pyramid_parser.add_argument("--sizes", nargs="+", default=["320x240", "640x480", "1280x720"])
+    pyramid_parser.add_argument("--scales", type=int, nargs="+", default=[2, 3, 4])
+    pyramid_parser.add_argument("--path", help="recorded image or video to use instead of a synthetic frame")
+    pyramid_parser.add_argument("--repeat", type=int, default=50)
+    pyramid_parser.add_argument("--seeds", type=int, default=20, help="cluttered frames checked at each scale")
+    pyramid_parser.set_defaults(run=benchmarkPyramid)
+
+    graph_parser = subparsers.add_parser("graph", help="pipeline step graph before and after optimization")
+    graph_parser.add_argument("--graph", default=os.path.join(os.path.dirname(__file__), "vision", "pipeline.json"))
+    graph_parser.add_argument("--path", help="recorded images or video to use instead of synthetic frames")
+    graph_parser.add_argument("--limit", type=int, default=10, help="maximum number of frames to load")
+    graph_parser.add_argument("--repeat", type=int, default=20)
+    graph_parser.set_defaults(run=benchmarkGraph)
+
+    tracking_parser = subparsers.add_parser("tracking", help="detect every frame vs detect every N frames and track")
+    tracking_parser.add_argument("--path", help="recorded images or video to use instead of synthetic frames")
+    tracking_parser.add_argument("--limit", type=int, default=200, help="maximum number of frames to use")
+    tracking_parser.add_argument("--size", default="640x480", help="size of the synthetic frames")
+    tracking_parser.add_argument("--intervals", type=int, nargs="+", default=[2, 5, 10])
+    tracking_parser.set_defaults(run=benchmarkTracking)
+
+    targets_parser = subparsers.add_parser("targets", help="several target types with independent vs shared intermediates")
+    targets_parser.add_argument("--targets", default=os.path.join(os.path.dirname(__file__), "vision", "targets.json"))
+    targets_parser.add_argument("--path", help="recorded images or video to use instead of synthetic frames")
+    targets_parser.add_argument("--limit", type=int, default=10, help="maximum number of frames to use")
+    targets_parser.add_argument("--size", default="640x480", help="size of the synthetic frames")
+    targets_parser.add_argument("--pyramid", type=int, default=0, help="coarse-to-fine detection scale (0 for off)")
+    targets_parser.add_argument("--repeat", type=int, default=20)
+    targets_parser.set_defaults(run=benchmarkTargets)
+
+    raw_parser = subparsers.add_parser("rawfile", help="convert recorded frames to a raw frame file")
+    raw_parser.add_argument("path", help="directory of recorded images or a video file")
+    raw_parser.add_argument("output", help="raw frame file to write")
+    raw_parser.add_argument("--limit", type=int, help="maximum number of frames to convert")
+    raw_parser.set_defaults(run=createRawFile)
+
+    load_parser = subparsers.add_parser("load", help="run the full processing loop from recorded frames")
+    load_parser.add_argument("path", help="raw frame file (with --width/--height), image directory or video file")
+    load_parser.add_argument("--width", type=int, help="frame width of a raw frame file")
+    load_parser.add_argument("--height", type=int, help="frame height of a raw frame file")
+    load_parser.add_argument("--fps", type=float, default=0, help="frame rate limit (0 for as fast as possible)")
+    load_parser.add_argument("--seconds", type=float, default=10, help="length of the test")
+    load_parser.set_defaults(run=benchmarkLoad)
+
+    args = parser.parse_args()
+    args.run(args)
+
+
+if __name__ == "__main__":
+    main()
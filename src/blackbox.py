@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+
+"""
+----------------------------------------------------------------------------
+Authors:     FRC Team 4145
+
+Description: Reads black box recordings (the ring file or a saved file from
+             the USB drive).  Run with the command and the file, e.g.
+             "python3 blackbox.py info blackbox-14-02-33.bin".
+
+Comments:    Extracted frames can be replayed with "benchmark.py replay"
+             (image directory) or "benchmark.py load" (--raw file).
+----------------------------------------------------------------------------
+"""
+
+import argparse
+import datetime
+import os
+import cv2
+from vision import BlackBox, RawFrameSource
+
+
+def showInfo(args):
+    """
+    Print the recording size and the index of the recorded frames.
+    """
+
+    (header, index, frames) = BlackBox.openFile(args.path)
+    slots = BlackBox.recordedSlots(header, index)
+
+    print("{}x{} frames, {} of {} slots recorded".format(header["width"], header["height"], len(slots), len(index)))
+    if (len(slots) == 0):
+        return
+
+    first = index[slots[0]]
+    last = index[slots[-1]]
+    print("Frames {} to {} over {:.1f} s".format(first["sequence"], last["sequence"], last["wall_time"] - first["wall_time"]))
+
+    if (args.frames):
+        print("{:>8} {:>15} {:>16} {:>8}  centroids".format("sequence", "time", "capture (us)", "targets"))
+        for slot in slots:
+            entry = index[slot]
+            count = min(int(entry["target_count"]), len(entry["cx"]))
+            centroids = " ".join("({:.0f}, {:.0f})".format(entry["cx"][i], entry["cy"][i]) for i in range(count))
+            wall_time = datetime.datetime.fromtimestamp(entry["wall_time"]).strftime("%H:%M:%S.%f")
+            print("{:>8} {:>15} {:>16} {:>8}  {}".format(entry["sequence"], wall_time, entry["frame_time"],
+                                                       entry["target_count"], centroids))
+
+
+def extractFrames(args):
+    """
+    Write the recorded frames, oldest first, as images or a raw frame file.
+    """
+
+    (header, index, frames) = BlackBox.openFile(args.path)
+    slots = BlackBox.recordedSlots(header, index)
+    if (len(slots) == 0):
+        raise SystemExit("No frames recorded in " + args.path)
+
+    if (args.raw):
+        RawFrameSource.writeRawFile(args.output, (frames[slot] for slot in slots))
+        print("Wrote {} frames of {}x{} to {} (use --width {} --height {})".format(
+            len(slots), header["width"], header["height"], args.output, header["width"], header["height"]))
+        return
+
+    if (not os.path.isdir(args.output)):
+        os.makedirs(args.output)
+
+    for slot in slots:
+        name = os.path.join(args.output, "frame-{:08d}.{}".format(index[slot]["sequence"], args.format))
+        cv2.imwrite(name, frames[slot])
+
+    print("Wrote {} frames to {}".format(len(slots), args.output))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Black box recording tools")
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.required = True
+
+    info_parser = subparsers.add_parser("info", help="show the recorded frames")
+    info_parser.add_argument("path", help="black box ring or saved file")
+    info_parser.add_argument("--frames", action="store_true", help="list the index of every frame")
+    info_parser.set_defaults(run=showInfo)
+
+    extract_parser = subparsers.add_parser("extract", help="write the recorded frames to images or a raw file")
+    extract_parser.add_argument("path", help="black box ring or saved file")
+    extract_parser.add_argument("output", help="image directory (or raw frame file with --raw)")
+    extract_parser.add_argument("--raw", action="store_true", help="write a raw frame file")
+    extract_parser.add_argument("--format", default="png", help="image file extension")
+    extract_parser.set_defaults(run=extractFrames)
+
+    args = parser.parse_args()
+    args.run(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -16,29 +16,83 @@ Comments:    This script should be uploaded to the Raspberry Pi using the
 ----------------------------------------------------------------------------
 """
 
+import time
+
+# Startup timing includes loading the modules below
+START_TIME = time.monotonic()
+
 import sys
-from vision import CameraHost, ConfigParser, Connection, Constants, Logger, UsbDrive, VisionProcessor
+import signal
+import concurrent.futures
+from vision import (CameraHost, ConfigParser, Connection, Constants, Logger, MultiCameraHost, StagedVisionProcessor,
+                    StartupReport, UsbDrive, VisionProcessor)
+
+
+def startNetworkTables(logger, config, startup_report):
+    """
+    Start NetworkTables and record when it is ready.
+    """
+
+    connection = Connection(logger, config.server, config.team)
+    startup_report.mark("networktables")
+
+    return connection
 
 
 def main():
 
-    # Start the USB drive
-    usb_drive = UsbDrive()
+    # Exit normally on SIGTERM so buffered logs and images are flushed
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+    # Start the USB drive (mounting in the background with a fast start)
+    usb_drive = UsbDrive(Constants.ENABLE_FAST_START)
 
     # Create logger
     logger = Logger(usb_drive)
+    startup_report = StartupReport(logger, START_TIME, usb_drive)
 
     # Parse config from file
     config = ConfigParser(logger)
 
-    # Start NetworkTables
-    connection = Connection(logger, config.server, config.team)
+    # Run each camera in its own process
+    if (Constants.ENABLE_MULTI_CAMERA and len(config.camera_configs) > 1):
+        # Worker processes need the mounted drive (the mount thread is not forked)
+        usb_drive.waitForStart()
+        multi_camera_host = MultiCameraHost(logger, config, usb_drive)
+        multi_camera_host.run()
+        return
+
+    # Run capture, detection, publishing and output in separate processes
+    if (Constants.ENABLE_STAGED_PIPELINE):
+        usb_drive.waitForStart()
+        staged_processor = StagedVisionProcessor(logger, config, usb_drive)
+        if (staged_processor.start()):
+            # Exit with an error when a stage cannot be restarted, so the service restarts
+            if (not staged_processor.run()):
+                sys.exit(1)
+            return
+
+    if (Constants.ENABLE_FAST_START):
+        # Start NetworkTables while the camera starts
+        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+            connection_future = executor.submit(startNetworkTables, logger, config, startup_report)
+
+            camera_host = CameraHost(logger, config.camera_configs, None)
+            startup_report.mark("camera")
+
+            connection = connection_future.result()
+            camera_host.connection = connection
+    else:
+        # Start NetworkTables
+        connection = startNetworkTables(logger, config, startup_report)
 
-    # Start camera(s)
-    camera_host = CameraHost(logger, config.camera_configs, connection)
+        # Start camera(s)
+        camera_host = CameraHost(logger, config.camera_configs, connection)
+        startup_report.mark("camera")
 
     # Create Vision Processor
     visionProcessor = VisionProcessor(logger, connection, camera_host)
+    visionProcessor.startup_report = startup_report
 
     # Continuously process vision pipeline
     while True:
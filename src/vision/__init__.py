@@ -1,8 +1,30 @@
+from .blackBox import BlackBox
+from .bufferPool import BufferPool
 from .cameraHost import CameraHost
+from .componentDetector import ComponentDetector
 from .configParser import ConfigParser
 from .connection import Connection
 from .constants import Constants
+from .dashboardStream import DashboardStream
+from .contourFeatures import ContourData, ContourFeatures
+from .contourFilter import ContourFilter
+from .frameCache import FrameCache
+from .frameCapture import FrameCapture
+from .frameSource import CameraFrameSource, FileFrameSource, FrameClock, FrameSource, RawFrameSource
+from .imageWriter import ImageWriter
+from .latencyController import LatencyController
 from .pipeline import Pipeline
+from .pipelineGraph import PipelineGraph
+from .pipelineTuner import PipelineTuner
+from .pyramidDetector import PyramidDetector
+from .roiTracker import RoiTracker
+from .stageTimer import StageTimer
+from .startupReport import StartupReport
+from .targetSet import Target, TargetSet
+from .targetTracker import TargetTracker
 from .logger import Logger
+from .logWriter import LogWriter
 from .usbDrive import UsbDrive
 from .visionProcessor import VisionProcessor
+from .multiCamera import MultiCameraHost
+from .stagePipeline import StagedVisionProcessor
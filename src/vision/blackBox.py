@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+
+"""
+----------------------------------------------------------------------------
+Authors:     FRC Team 4145
+
+Description: "Black box" frame recorder.  Every frame is downscaled straight
+             into a slot of a fixed-size, memory-mapped ring file on the USB
+             drive, with an index entry holding its timestamps and results.
+             A trigger copies the last few seconds of the ring to a separate
+             file (in the background) while recording continues.
+
+Comments:    File layout: a header, the index (one entry per slot) and the
+             frame slots, which start on a page boundary.  Saved files use
+             the same layout.  Use src/blackbox.py to list and extract frames.
+----------------------------------------------------------------------------
+"""
+
+import os
+import threading
+import time
+import cv2
+import numpy
+
+
+MAGIC = b"BLACKBOX"
+VERSION = 1
+
+# Targets whose centroids are kept in the index
+MAX_INDEX_TARGETS = 4
+
+HEADER_DTYPE = numpy.dtype([("magic", "S8"), ("version", "<u4"), ("width", "<u4"), ("height", "<u4"),
+                            ("slot_count", "<u4"), ("frame_count", "<u8")])
+
+INDEX_DTYPE = numpy.dtype([("sequence", "<i8"), ("frame_time", "<i8"), ("wall_time", "<f8"),
+                           ("target_count", "<i4"), ("cx", "<f4", (MAX_INDEX_TARGETS,)),
+                           ("cy", "<f4", (MAX_INDEX_TARGETS,))])
+
+HEADER_SIZE = 64
+PAGE_SIZE = 4096
+
+
+class BlackBox:
+
+    def __init__(self, logger, path, save_dir, size, scale):
+        self.logger = logger
+        # Ring file and folder for saved recordings
+        self.path = path
+        self.save_dir = save_dir
+        # Ring file size (bytes) and frame downscale factor
+        self.size = size
+        self.scale = scale
+
+        # Memory-mapped header, index and frames (None until the ring file is ready)
+        self.header = None
+        self.index = None
+        self.frames = None
+        self.creator = None
+
+        self.saver = None
+
+    @staticmethod
+    def frameOffset(slot_count):
+        """
+        Offset of the first frame slot.
+        """
+
+        index_end = HEADER_SIZE + slot_count * INDEX_DTYPE.itemsize
+        return (index_end + PAGE_SIZE - 1) // PAGE_SIZE * PAGE_SIZE
+
+    @staticmethod
+    def createFile(path, width, height, slot_count):
+        """
+        Create a ring file and map it.  An existing file of the same layout is
+        continued, so the frames recorded before a restart are kept.
+        :return: Tuple of (header, index, frames) memory maps
+        """
+
+        frame_offset = BlackBox.frameOffset(slot_count)
+        file_size = frame_offset + slot_count * width * height * 3
+
+        if (not os.path.exists(path) or os.path.getsize(path) != file_size):
+            with open(path, "wb") as file:
+                file.truncate(file_size)
+
+        header = numpy.memmap(path, dtype=HEADER_DTYPE, mode="r+", shape=(1,))
+        index = numpy.memmap(path, dtype=INDEX_DTYPE, mode="r+", offset=HEADER_SIZE, shape=(slot_count,))
+        frames = numpy.memmap(path, dtype=numpy.uint8, mode="r+", offset=frame_offset,
+                              shape=(slot_count, height, width, 3))
+
+        if (header[0]["magic"] != MAGIC or header[0]["version"] != VERSION or header[0]["width"] != width or
+                header[0]["height"] != height or header[0]["slot_count"] != slot_count):
+            # Start empty
+            index["sequence"] = -1
+            header[0] = (MAGIC, VERSION, width, height, slot_count, 0)
+
+        return (header, index, frames)
+
+    @staticmethod
+    def openFile(path):
+        """
+        Map a ring or saved file read-only.
+        :return: Tuple of (header, index, frames)
+        """
+
+        header = numpy.memmap(path, dtype=HEADER_DTYPE, mode="r", shape=(1,))[0]
+        if (header["magic"] != MAGIC or header["version"] != VERSION):
+            raise ValueError("{} is not a black box recording".format(path))
+
+        slot_count = int(header["slot_count"])
+        (width, height) = (int(header["width"]), int(header["height"]))
+        index = numpy.memmap(path, dtype=INDEX_DTYPE, mode="r", offset=HEADER_SIZE, shape=(slot_count,))
+        frames = numpy.memmap(path, dtype=numpy.uint8, mode="r", offset=BlackBox.frameOffset(slot_count),
+                              shape=(slot_count, height, width, 3))
+
+        return (header, index, frames)
+
+    @staticmethod
+    def recordedSlots(header, index):
+        """
+        Slots holding frames, oldest first (starting from the slot written
+        next).  Sequence numbers restart with the program, so they are not
+        used for the order.
+        """
+
+        slots = numpy.roll(numpy.arange(len(index)), -int(header["frame_count"] % len(index)))
+        return slots[index["sequence"][slots] >= 0]
+
+    def start(self, width, height):
+        """
+        Create the ring file in the background (frames are not recorded until
+        it is ready).
+        """
+
+        (width, height) = (max(width // self.scale, 1), max(height // self.scale, 1))
+        slot_count = max((self.size - PAGE_SIZE) // (width * height * 3 + INDEX_DTYPE.itemsize), 1)
+
+        def create():
+            try:
+                (self.header, self.index, self.frames) = self.createFile(self.path, width, height, slot_count)
+                self.logger.logMessage("Black box recording {} frames of {}x{} to {}".format(
+                    slot_count, width, height, self.path))
+            except (OSError, ValueError) as error:
+                self.logger.logMessage("Could not create black box file: " + str(error))
+
+        self.creator = threading.Thread(target=create, name="BlackBoxCreate", daemon=True)
+        self.creator.start()
+
+    def record(self, frame, frame_time, sequence, contour_data):
+        """
+        Write a frame and its results to the next slot of the ring.
+        """
+
+        if (self.creator is None):
+            (height, width) = frame.shape[:2]
+            self.start(width, height)
+        if (self.frames is None):
+            return
+
+        header = self.header
+        frame_count = int(header["frame_count"][0])
+        slot = frame_count % len(self.frames)
+
+        # Invalidate the slot while it is written
+        entry = self.index[slot]
+        entry["sequence"] = -1
+
+        size = (self.frames.shape[2], self.frames.shape[1])
+        cv2.resize(frame, size, dst=self.frames[slot], interpolation=cv2.INTER_NEAREST)
+
+        count = min(len(contour_data), MAX_INDEX_TARGETS)
+        entry["frame_time"] = frame_time
+        entry["wall_time"] = time.time()
+        entry["target_count"] = len(contour_data)
+        entry["cx"][:] = 0
+        entry["cy"][:] = 0
+        entry["cx"][:count] = [contour.cx for contour in contour_data[:count]]
+        entry["cy"][:count] = [contour.cy for contour in contour_data[:count]]
+        entry["sequence"] = sequence
+
+        header["frame_count"] = frame_count + 1
+
+    def trigger(self, reason, seconds):
+        """
+        Save the last seconds of the ring to a separate file in the background.
+        :return: True if a save was started
+        """
+
+        if (self.frames is None or (self.saver is not None and self.saver.is_alive())):
+            return False
+
+        now = time.time()
+        slots = self.recordedSlots(self.header[0], self.index)
+        slots = slots[self.index["wall_time"][slots] >= now - seconds]
+        if (len(slots) == 0):
+            return False
+
+        # Remember the sequence numbers to detect frames overwritten during the copy
+        sequences = self.index["sequence"][slots].copy()
+        path = os.path.join(self.save_dir, time.strftime("blackbox-%H-%M-%S.bin"))
+        self.logger.logMessage("Black box triggered ({}), saving {} frames to {}".format(reason, len(slots), path))
+
+        self.saver = threading.Thread(target=self.save, args=(path, slots, sequences), name="BlackBoxSave", daemon=True)
+        self.saver.start()
+
+        return True
+
+    def save(self, path, slots, sequences):
+        """
+        Copy slots of the ring to a new file.
+        """
+
+        (height, width) = self.frames.shape[1:3]
+        try:
+            (header, index, frames) = self.createFile(path, width, height, len(slots))
+
+            saved = 0
+            for (slot, sequence) in zip(slots, sequences):
+                frames[saved] = self.frames[slot]
+                index[saved] = self.index[slot]
+                # Skip frames the recorder replaced while they were copied
+                if (self.index["sequence"][slot] == sequence):
+                    saved += 1
+
+            index["sequence"][saved:] = -1
+            header["frame_count"] = saved
+            frames.flush()
+            index.flush()
+            header.flush()
+        except (OSError, ValueError) as error:
+            self.logger.logMessage("Could not save black box frames: " + str(error))
+            return
+
+        self.logger.logMessage("Black box saved {} frames to {}".format(saved, path))
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+
+"""
+----------------------------------------------------------------------------
+Authors:     FRC Team 4145
+
+Description: Pool of named, reusable image buffers.  Buffers are allocated
+             the first time they are requested and only reallocated when a
+             larger frame arrives, so steady-state processing does not
+             allocate new arrays.
+----------------------------------------------------------------------------
+"""
+
+import numpy
+
+
+class BufferPool:
+
+    def __init__(self):
+        # Flat backing arrays keyed by buffer name
+        self.buffers = {}
+
+    def get(self, name, shape, dtype=numpy.uint8):
+        """
+        Get a contiguous buffer with the requested shape.
+        :param name: Name of the buffer (one buffer per pipeline stage)
+        :param shape: Shape of the image the buffer should hold
+        :param dtype: Data type of the buffer
+        :return: A numpy.ndarray view into the pooled storage
+        """
+
+        size = 1
+        for dimension in shape:
+            size *= dimension
+
+        buffer = self.buffers.get(name)
+        if (buffer is None or buffer.dtype != dtype or buffer.size < size):
+            buffer = numpy.empty(size, dtype=dtype)
+            self.buffers[name] = buffer
+
+        return buffer[:size].reshape(shape)
+
+    def clear(self):
+        """
+        Release all pooled buffers.
+        """
+
+        self.buffers = {}
+
+    def allocatedBytes(self):
+        """
+        Total number of bytes held by the pool.
+        """
+
+        return sum(buffer.nbytes for buffer in self.buffers.values())
@@ -12,8 +12,14 @@ Description: This script uses a generated CV2 pipeline to process a camera
 
 import time
 import json
-from cscore import CameraServer, VideoSource, UsbCamera
+try:
+    from cscore import CameraServer, CvSource, VideoMode, VideoSource, UsbCamera
+except ImportError:
+    # cscore is only needed with a camera (offline benchmarks run without it)
+    CameraServer = CvSource = VideoMode = VideoSource = UsbCamera = None
 from .constants import Constants
+from .dashboardStream import DashboardStream
+from .frameCapture import FrameCapture
 
 
 class CameraHost:
@@ -22,29 +28,50 @@ class CameraHost:
     vision_camera = None
     # Source for outputting OpenCV frames
     cv_source = None
-
-    def __init__(self, logger, camera_configs, connection):
+    # Sink for reading OpenCV frames from the vision camera
+    cv_sink = None
+    # Background capture thread
+    frame_capture = None
+    # Reusable frame buffer when capturing without the background thread
+    frame_buffer = None
+    # Sequence number of the last frame read
+    frame_sequence = 0
+
+    def __init__(self, logger, camera_configs, connection, camera_index=0, stream_port=None):
         self.logger = logger
         self.camera_configs = camera_configs
         self.connection = connection
+        self.camera_index = camera_index
+        self.stream_port = stream_port
 
         self.startCamera()
 
     def startCamera(self):
         """
-        Start the camera listed first in the camera config
+        Start the camera at camera_index in the camera config (the first camera by default)
         """
 
-        if (len(self.camera_configs) > 0):
+        if (len(self.camera_configs) > self.camera_index):
             # Start vision camera
-            camera_config = self.camera_configs[0]
+            camera_config = self.camera_configs[self.camera_index]
             (parsed_width, parsed_height) = self.parseDimensions(camera_config)
             self.vision_camera = self.startVisionCamera(camera_config)
-            time.sleep(1)
+            self.cv_sink = self.startVisionSink(self.vision_camera)
+
+            # Give the camera time to connect (with a fast start, frames are read as soon as they arrive)
+            if (not Constants.ENABLE_FAST_START):
+                time.sleep(1)
+
+            # Start capturing frames in the background
+            if (Constants.ENABLE_THREADED_CAPTURE):
+                self.frame_capture = FrameCapture(self.logger, self.cv_sink, parsed_width, parsed_height,
+                                                  Constants.CAPTURE_BUFFER_COUNT)
+                self.frame_capture.start()
 
             # Start custom output stream
             if (Constants.ENABLE_CUSTOM_STREAM):
-                self.cv_source = self.startOutputSource(parsed_width, parsed_height)
+                (stream_width, stream_height) = DashboardStream.streamSize(parsed_width, parsed_height)
+                self.cv_source = self.startOutputSource(stream_width, stream_height, camera_config.name)
 
     def startVisionCamera(self, config):
         """
@@ -60,6 +87,14 @@ class CameraHost:
 
         return camera
 
+    def startVisionSink(self, camera):
+        """
+        Create the long-lived sink used to read frames from the vision camera.
+        """
+
+        inst = CameraServer.getInstance()
+        return inst.getVideo(camera=camera)
+
     def parseDimensions(self, camera_config):
         """
         Parse the width and height of the camera.
@@ -75,7 +110,7 @@ class CameraHost:
 
         return (width, height)
 
-    def startOutputSource(self, width, height):
+    def startOutputSource(self, width, height, camera_name):
         """
         Create an output source and server to ouput custom frames.
         """
@@ -83,26 +118,56 @@ class CameraHost:
         self.logger.logMessage("Starting Custom Output Stream...")
 
         inst = CameraServer.getInstance()
-        cv_source = inst.putVideo("vision", width, height)
+        if (self.stream_port is None):
+            cv_source = inst.putVideo("vision", width, height)
+        else:
+            # Each camera process needs its own fixed server port
+            name = "vision-" + camera_name
+            cv_source = CvSource(name, VideoMode.PixelFormat.kMJPEG, width, height, 30)
+            server = inst.addServer(name="serve_" + name, port=self.stream_port)
+            server.setSource(cv_source)
+            self.logger.logMessage("Custom Output Stream '{}' on port {}".format(name, self.stream_port))
 
         return cv_source
 
     def readVisionFrame(self):
         """
         Reads the latest frame from the camera server instance to pass to opencv.
-        :param camera: The camera to read from
         :return: The latest frame
         """
 
-        frame = None
-        if (self.vision_camera is not None):
-            inst = CameraServer.getInstance()
-            cv_sink = inst.getVideo(camera=self.vision_camera)
-
-            (frame_time, frame) = cv_sink.grabFrame(None)
+        (frame, frame_time, sequence) = self.readLatestFrame()
 
         return frame
 
+    def readLatestFrame(self):
+        """
+        Reads the latest frame along with its capture timestamp and sequence number.
+        :return: Tuple of (frame, frame_time, sequence)
+        """
+
+        frame = None
+        frame_time = 0
+        sequence = self.frame_sequence
+
+        if (self.frame_capture is not None):
+            # Wait only if the newest frame has already been read
+            (frame, frame_time, sequence) = self.frame_capture.read(self.frame_sequence, Constants.CAPTURE_TIMEOUT)
+            if (sequence == self.frame_sequence):
+                frame = None
+
+        elif (self.cv_sink is not None):
+            (frame_time, frame) = self.cv_sink.grabFrame(self.frame_buffer)
+            if (frame_time == 0):
+                frame = None
+            else:
+                self.frame_buffer = frame
+                sequence += 1
+
+        self.frame_sequence = sequence
+
+        return (frame, frame_time, sequence)
+
     def outputVisionFrame(self, frame):
         """
         Output an OpenCV frame to the custom vision camera server.
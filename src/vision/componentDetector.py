@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+
+"""
+----------------------------------------------------------------------------
+Authors:     FRC Team 4145
+
+Description: Connected-components detection backend.  Labels every blob of
+             the binary image in one pass and only traces contours for the
+             blobs whose bounding box and area can pass the contour filter.
+----------------------------------------------------------------------------
+"""
+
+import cv2
+import numpy
+
+
+class ComponentDetector:
+
+    @staticmethod
+    def find_contours(input, external_only, min_width, max_width, min_height, max_height, min_area):
+        """
+        Find the contours of the blobs that can pass the contour size filters.
+        Args:
+            input: A binary numpy.ndarray.
+            external_only: A boolean. If true only external contours are found.
+            min_width: Minimum width of a contour.
+            max_width: Maximum width of a contour.
+            min_height: Minimum height of a contour.
+            max_height: Maximum height of a contour.
+            min_area: The minimum area of a contour.
+        Return:
+            A list of numpy.ndarray where each one represents a contour.
+        """
+
+        (count, labels, stats, centroids) = cv2.connectedComponentsWithStats(input, connectivity=8, ltype=cv2.CV_32S)
+
+        # Label 0 is the background
+        x = stats[1:, cv2.CC_STAT_LEFT]
+        y = stats[1:, cv2.CC_STAT_TOP]
+        width = stats[1:, cv2.CC_STAT_WIDTH]
+        height = stats[1:, cv2.CC_STAT_HEIGHT]
+        area = stats[1:, cv2.CC_STAT_AREA]
+
+        # A blob's outer contour has the blob's bounding box and encloses at most its
+        # pixel count, and every hole contour lies inside the outer one.  Minimum
+        # sizes therefore apply to all of a blob's contours, the maximum sizes and
+        # area only to the outer contour.
+        keep = (width >= min_width) & (height >= min_height)
+        if (external_only):
+            keep &= (width <= max_width) & (height <= max_height) & (area >= min_area)
+            mode = cv2.RETR_EXTERNAL
+        else:
+            mode = cv2.RETR_LIST
+
+        if (external_only):
+            outside = ComponentDetector.label_outside(input)
+
+        image_width = input.shape[1]
+        output = []
+        starts = []
+        for i in numpy.flatnonzero(keep).tolist():
+            (left, top, w, h) = (int(x[i]), int(y[i]), int(width[i]), int(height[i]))
+
+            # Blobs sitting inside another blob's hole have no external contour
+            if (external_only):
+                column = left + int(numpy.argmax(labels[top, left:left + w] == i + 1))
+                if (not outside[top, column + 1]):
+                    continue
+
+            # Trace only this blob, padded so it never touches the image border
+            # (a NumPy compare, cv2.compare reads a blob of up to 4 pixels in one column as a scalar)
+            blob = numpy.equal(labels[top:top + h, left:left + w], i + 1).view(numpy.uint8)
+            blob = cv2.copyMakeBorder(blob, 1, 1, 1, 1, cv2.BORDER_CONSTANT, value=0)
+            (contours, hierarchy) = cv2.findContours(blob, mode=mode, method=cv2.CHAIN_APPROX_SIMPLE,
+                                                     offset=(left - 1, top - 1))
+            output.extend(contours)
+
+            # The first point of a contour is where its border was found, except that
+            # the simplified chain of a hole can drop it (trace holed blobs again)
+            traced = contours
+            if (len(contours) > 1):
+                (traced, hierarchy) = cv2.findContours(blob, mode=mode, method=cv2.CHAIN_APPROX_NONE,
+                                                       offset=(left - 1, top - 1))
+            starts.extend(int(contour[0, 0, 1]) * image_width + int(contour[0, 0, 0]) for contour in traced)
+
+        # Same order as cv2.findContours: the reverse of the raster scan order the borders are found in
+        order = numpy.argsort(-numpy.array(starts, dtype=numpy.int64), kind="stable")
+
+        return [output[i] for i in order.tolist()]
+
+
+    @staticmethod
+    def label_outside(input):
+        """
+        Find the background pixels that are connected to the image border.
+        Args:
+            input: A binary numpy.ndarray.
+        Return:
+            A boolean numpy.ndarray padded by one pixel on every side.
+        """
+
+        # Holes are 4-connected when blobs are 8-connected
+        background = cv2.copyMakeBorder(input, 1, 1, 1, 1, cv2.BORDER_CONSTANT, value=0)
+        background = cv2.compare(background, 0, cv2.CMP_EQ)
+        (count, labels) = cv2.connectedComponents(background, connectivity=4, ltype=cv2.CV_32S)
+
+        return labels == labels[0, 0]
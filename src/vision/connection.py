@@ -10,10 +10,17 @@ Description: This script uses a generated CV2 pipeline to process a camera
 ----------------------------------------------------------------------------
 """
 
+import copy
 import time
 import sys
-from networktables import NetworkTablesInstance
+try:
+    from networktables import NetworkTablesInstance
+except ImportError:
+    # NetworkTables is only needed on the robot network (offline benchmarks run without it)
+    NetworkTablesInstance = None
 import json
+from .constants import Constants
+from .frameSource import FrameClock
 
 
 # Network Table constants
@@ -25,10 +32,32 @@ CAMERA_SELECTION = "CameraSelection"
 
 class Connection:
 
-    def __init__(self, logger, server, team):
+    def __init__(self, logger, server, team, camera_name=None, client_address=None, new_instance=False):
         self.logger = logger
         self.server = server
         self.team = team
+        # Publish under a per-camera sub table when set
+        self.camera_name = camera_name
+        # Connect to this address instead of the team's robot when set
+        self.client_address = client_address
+        # Use a new NetworkTables instance instead of the default one (worker processes
+        # inherit the parent's default instance, which is already started in server mode)
+        self.new_instance = new_instance
+        self.ntinst = None
+
+        # Cached table and entry handles
+        self.table = None
+        self.entries = {}
+
+        # Numeric output state
+        self.sequence = 0
+        self.last_values = None
+
+        # Time (time.monotonic) of the last publishValues call
+        self.publish_time = 0.0
+        # Converts frame times to ages for the latency (shared with target connections)
+        self.frame_clock = FrameClock(logger)
+
         self.startNetworkTables()
 
     def startNetworkTables(self):
@@ -36,27 +65,170 @@ class Connection:
         Connect to the Network Tables as a client or start the server locally.
         """
 
-        ntinst = NetworkTablesInstance.getDefault()
+        if (NetworkTablesInstance is None):
+            self.logger.logMessage("NetworkTables is not installed, values will not be published")
+            return
+
+        if (self.new_instance):
+            self.ntinst = NetworkTablesInstance.create()
+        else:
+            self.ntinst = NetworkTablesInstance.getDefault()
+        ntinst = self.ntinst
 
         if self.server:
             self.logger.logMessage("Setting up NetworkTables server...")
             ntinst.startServer()
+        elif self.client_address is not None:
+            self.logger.logMessage("Setting up NetworkTables client for {}".format(self.client_address))
+            ntinst.startClient(self.client_address)
         else:
             self.logger.logMessage("Setting up NetworkTables client for team {}".format(self.team))
             ntinst.startClientTeam(self.team)
 
-    def publishValues(self, contour_data):
+    def getTable(self):
+        """
+        Get the 'vision' network table (or the camera's sub table).
+        :return: The table, or None when NetworkTables is not installed
+        """
+
+        if (self.table is None and self.ntinst is not None):
+            self.table = self.ntinst.getTable(SMART_DASHBOARD).getSubTable(VISION_TABLE)
+
+            if (self.camera_name is not None):
+                self.table = self.table.getSubTable(self.camera_name)
+
+        return self.table
+
+    def targetConnection(self, name):
+        """
+        Get a connection publishing under a sub table of this connection's
+        table, for the results of another target type.  NetworkTables is not
+        started again.
+        """
+
+        connection = copy.copy(self)
+        table = self.getTable()
+        connection.table = table.getSubTable(name) if (table is not None) else None
+        connection.entries = {}
+        connection.sequence = 0
+        connection.last_values = None
+        connection.publish_time = 0.0
+
+        return connection
+
+    def getEntry(self, key):
+        """
+        Get a cached entry of the 'vision' network table.
+        """
+
+        entry = self.entries.get(key)
+        if (entry is None):
+            entry = self.getTable().getEntry(key)
+            self.entries[key] = entry
+
+        return entry
+
+    def publishValues(self, contour_data, frame_time=0, sequence=None):
         """
         Publish coordinates/values to the 'vision' network table.
+        :param frame_time: Capture timestamp of the frame (microseconds)
+        :param sequence: Sequence number of the frame (counted here if None)
+        """
+
+        if (sequence is None):
+            sequence = self.sequence + 1
+        self.sequence = sequence
+        self.publish_time = time.monotonic()
+
+        if (self.getTable() is None):
+            return
+
+        if (Constants.ENABLE_NUMERIC_OUTPUT):
+            self.publishNumeric(contour_data)
+        else:
+            table = self.getTable()
+
+            contour_string = self.convertToString(contour_data)
+            table.putValue("contour_data", contour_string)
+
+            self.logger.logMessage(contour_string)
+
+        self.publishLatency(frame_time)
+
+    def publishLatency(self, frame_time):
+        """
+        Publish the capture time of the frame and the time (milliseconds) from
+        capture to publish.  The capture time is published every frame so the
+        robot can tell if unchanged values are still current.
+        """
+
+        if (frame_time <= 0):
+            return
+
+        self.getEntry("capture_time").setDouble(frame_time)
+
+        age = self.frame_clock.frameAge(frame_time, self.publish_time)
+        if (age is not None):
+            self.getEntry("latency").setDouble(age * 1000)
+
+    def publishNumeric(self, contour_data):
+        """
+        Publish contour data as parallel number arrays.  Nothing is published
+        when the values are the same as the last frame.
+        """
+
+        cx = []
+        cy = []
+        box_x = []
+        box_y = []
+        area = []
+        for contour in contour_data:
+            cx.append(contour.cx)
+            cy.append(contour.cy)
+            box = contour.box[0]
+            box_x.extend(box[:, 0].tolist())
+            box_y.extend(box[:, 1].tolist())
+            area.append(contour.area)
+
+        values = (cx, cy, box_x, box_y, area)
+        if (values == self.last_values):
+            return
+        self.last_values = values
+
+        self.getEntry("cx").setDoubleArray(cx)
+        self.getEntry("cy").setDoubleArray(cy)
+        self.getEntry("box_x").setDoubleArray(box_x)
+        self.getEntry("box_y").setDoubleArray(box_y)
+        self.getEntry("area").setDoubleArray(area)
+        self.getEntry("frame_sequence").setDouble(self.sequence)
+
+        self.logger.logMessage("Published {} contours (frame {})".format(len(cx), self.sequence), True)
+
+    def publishValue(self, key, value):
+        """
+        Publish a single value to the 'vision' network table.
+        """
+
+        table = self.getTable()
+
+        if (table is not None):
+            table.putValue(key, value)
+
+    def consumeFlag(self, key):
+        """
+        Check a boolean entry of the 'vision' network table set by the robot or
+        dashboard, and clear it.
         """
 
-        ntinst = NetworkTablesInstance.getDefault()
-        table = ntinst.getTable(SMART_DASHBOARD).getSubTable(VISION_TABLE)
+        if (self.getTable() is None):
+            return False
 
-        contour_string = self.convertToString(contour_data)
-        table.putValue("contour_data", contour_string)
+        entry = self.getEntry(key)
+        if (not entry.getBoolean(False)):
+            return False
 
-        self.logger.logMessage(contour_string)
+        entry.setBoolean(False)
+        return True
 
     def convertToString(self, contour_data):
         """
@@ -24,3 +24,195 @@ class Constants:
 
     # Number of frames between saving images
     FRAME_INTERVAL = 25
+
+    # Enable/Disable capturing frames on a background thread
+    ENABLE_THREADED_CAPTURE = True
+
+    # Number of preallocated frame buffers used by the capture thread
+    CAPTURE_BUFFER_COUNT = 3
+
+    # Maximum time (seconds) to wait for a new frame from the capture thread
+    CAPTURE_TIMEOUT = 0.5
+
+    # Enable/Disable reusing preallocated pipeline buffers between frames
+    ENABLE_LEAN_PIPELINE = True
+
+    # Keep references to every pipeline intermediate (for debugging)
+    KEEP_PIPELINE_INTERMEDIATES = False
+
+    # Enable/Disable the vectorized contour filter
+    ENABLE_VECTORIZED_FILTER = True
+
+    # Blob detection backend ("contours" traces every blob, "components" only
+    # traces blobs that can pass the contour filter)
+    DETECTION_BACKEND = "contours"
+
+    # Enable/Disable searching only around the last known target position
+    ENABLE_ROI_TRACKING = False
+
+    # Pixels added around the last known target boxes when searching
+    ROI_PADDING = 20
+
+    # Fraction of the target size added around the target boxes when searching
+    ROI_PADDING_SCALE = 0.5
+
+    # Number of frames between forced full-frame searches
+    ROI_FULL_FRAME_INTERVAL = 30
+
+    # Number of frames between ROI hit rate reports
+    ROI_REPORT_INTERVAL = 100
+
+    # Enable/Disable running every configured camera in its own process
+    ENABLE_MULTI_CAMERA = False
+
+    # Custom output stream port of the first camera (multi-camera mode)
+    STREAM_BASE_PORT = 1181
+
+    # Number of seconds between frame rate reports
+    FPS_REPORT_INTERVAL = 5
+
+    # Enable/Disable running capture, detection, publishing and output in separate processes
+    ENABLE_STAGED_PIPELINE = False
+
+    # Maximum number of frames waiting in front of each stage (oldest frames are dropped)
+    STAGE_QUEUE_DEPTH = 2
+
+    # Number of seconds between stage utilization reports
+    STAGE_REPORT_INTERVAL = 5
+
+    # Restarts of a stage within STAGE_RESTART_WINDOW seconds before all stages are stopped
+    STAGE_MAX_RESTARTS = 3
+
+    # Number of seconds over which stage restarts are counted
+    STAGE_RESTART_WINDOW = 60
+
+    # Seconds a restarted stage may go without frames (while the camera delivers them)
+    STAGE_RESTART_TIMEOUT = 5
+
+    # Maximum number of images waiting to be written to the USB drive
+    IMAGE_QUEUE_SIZE = 4
+
+    # Image to drop when the USB drive can't keep up ("oldest" or "newest")
+    IMAGE_DROP_POLICY = "oldest"
+
+    # Maximum number of seconds log lines are buffered before being written
+    LOG_FLUSH_INTERVAL = 2.0
+
+    # Number of buffered bytes that triggers an early log write
+    LOG_FLUSH_SIZE = 16384
+
+    # Log file size (bytes) at which the log is rotated
+    LOG_MAX_BYTES = 5000000
+
+    # Number of rotated log files to keep
+    LOG_BACKUP_COUNT = 5
+
+    # Publish contour data as number arrays instead of a string
+    ENABLE_NUMERIC_OUTPUT = False
+
+    # Enable/Disable per-stage timing instrumentation
+    ENABLE_STAGE_TIMING = False
+
+    # Number of samples per stage used for the timing percentiles
+    TIMING_WINDOW = 300
+
+    # Number of seconds between timing summaries
+    TIMING_REPORT_INTERVAL = 10
+
+    # Enable/Disable coarse-to-fine detection on a downscaled frame
+    ENABLE_PYRAMID_DETECTION = False
+
+    # Downscale factor of the coarse frame
+    PYRAMID_SCALE = 2
+
+    # Full-resolution pixels processed around each coarse candidate
+    PYRAMID_MARGIN = 8
+
+    # Number of frames between reports of the area processed at full resolution
+    PYRAMID_REPORT_INTERVAL = 100
+
+    # Enable/Disable running the pipeline from the step graph in PIPELINE_GRAPH_FILE
+    ENABLE_PIPELINE_GRAPH = False
+
+    # Pipeline step graph (relative to the vision directory)
+    PIPELINE_GRAPH_FILE = "pipeline.json"
+
+    # Enable/Disable the step graph optimizer (redundant stage removal, fusion, buffer reuse)
+    ENABLE_GRAPH_OPTIMIZER = True
+
+    # Enable/Disable tuning the pipeline parameters from the 'vision/tuning' NetworkTables table
+    ENABLE_LIVE_TUNING = False
+
+    # Enable/Disable degrading the processing when frames exceed the latency budget
+    ENABLE_LATENCY_CONTROL = False
+
+    # Per-frame processing time budget (seconds)
+    LATENCY_BUDGET = 0.040
+
+    # Step back up when the processing time is below this fraction of the budget
+    LATENCY_HEADROOM = 0.5
+
+    # Number of frames measured before each level change
+    LATENCY_WINDOW = 30
+
+    # Downscale factor used at the low resolution level
+    LATENCY_SCALE = 2
+
+    # Frames skipped per processed frame at the frame skipping level
+    LATENCY_SKIP_FRAMES = 1
+
+    # Enable/Disable recording capture-to-publish latency with the stage timings
+    ENABLE_LATENCY_TRACKING = True
+
+    # Enable/Disable tracking targets between full detections
+    ENABLE_TARGET_TRACKING = False
+
+    # Number of frames between full detections while targets are tracked
+    TRACK_DETECT_INTERVAL = 5
+
+    # Pixels around the targets searched by the tracker
+    TRACK_PADDING = 48
+
+    # Maximum forward-backward tracking error (pixels) of a box corner
+    TRACK_MAX_ERROR = 1.0
+
+    # Number of frames between reports of the tracked frame fraction
+    TRACK_REPORT_INTERVAL = 100
+
+    # Enable/Disable drawing and sending the custom stream on its own thread at a reduced size
+    ENABLE_DASHBOARD_STREAM = True
+
+    # Downscale factor of the custom stream
+    STREAM_SCALE = 2
+
+    # Maximum frame rate of the custom stream
+    STREAM_MAX_FPS = 15
+
+    # Enable/Disable recording recent frames to a ring file on the USB drive
+    ENABLE_BLACK_BOX = False
+
+    # Size of the ring file (megabytes)
+    BLACKBOX_SIZE_MB = 256
+
+    # Downscale factor of the recorded frames
+    BLACKBOX_SCALE = 2
+
+    # Seconds of recording saved when the black box is triggered
+    BLACKBOX_TRIGGER_SECONDS = 10
+
+    # Enable/Disable triggering the black box when the targets are lost
+    BLACKBOX_TRIGGER_ON_LOSS = False
+
+    # Frames without targets (after targets were seen) that count as a loss
+    BLACKBOX_LOSS_FRAMES = 15
+
+    # Enable/Disable starting the USB drive, NetworkTables and the camera at the same time
+    # (processing starts with the first frame and USB logging attaches when the drive is mounted)
+    ENABLE_FAST_START = False
+
+    # Enable/Disable finding the additional target types of TARGETS_FILE in every frame
+    # (the pipelines share the HSV conversion and downscaled copies of the frame; not used by the staged pipeline)
+    ENABLE_MULTI_TARGET = False
+
+    # Additional target types (relative to the vision directory)
+    TARGETS_FILE = "targets.json"
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+
+"""
+----------------------------------------------------------------------------
+Authors:     FRC Team 4145
+
+Description: Per-frame table of contour features.  The contour filter fills
+             in the features it computes for every contour it keeps (bounding
+             box, area and convex hull), and the moments and minimum area
+             rectangles are added from them for all contours at once.  Later
+             stages (contour data, tracking, publishing) read the arrays
+             instead of measuring each contour again.
+
+Comments:    Row i of every array belongs to contours[i].  ContourData is a
+             view of one row.
+----------------------------------------------------------------------------
+"""
+
+import copy
+import cv2
+import numpy
+from .contourFilter import ContourFilter
+
+
+# Features filled in by the contour filter (one row per contour)
+FILTER_FEATURES = ("x", "y", "width", "height", "area", "hull_area")
+
+# Features measured from the contours and hulls (None until measure is called)
+MEASURED_FEATURES = ("m00", "m10", "m01", "cx", "cy", "rect_center", "rect_size", "rect_angle", "boxes")
+
+
+class ContourFeatures:
+
+    def __init__(self, contours=(), rows=()):
+        """
+        Args:
+            contours: The kept contours as a list of numpy.ndarray.
+            rows: One (x, y, width, height, area, hull, hull_area) tuple per contour.
+        """
+
+        self.contours = list(contours)
+        self.hulls = [row[5] for row in rows]
+
+        # Bounding boxes (cv2.boundingRect), contour and hull areas
+        table = numpy.array([row[:5] + row[6:] for row in rows], dtype=numpy.float64).reshape(-1, 6)
+        bounds = table[:, :4].astype(numpy.int64)
+        (self.x, self.y, self.width, self.height) = bounds.T
+        (self.area, self.hull_area) = (table[:, 4], table[:, 5])
+
+        self.clearMeasured()
+
+    def __len__(self):
+        return len(self.contours)
+
+    def clearMeasured(self):
+        """
+        Forget the measured features (after the contours changed).
+        """
+
+        # Spatial moments (cv2.moments) and centers of mass (truncated like int(), stored as floats)
+        self.m00 = None
+        self.m10 = None
+        self.m01 = None
+        self.cx = None
+        self.cy = None
+
+        # Minimum area rectangles (cv2.minAreaRect) and their corners (cv2.boxPoints, truncated)
+        self.rect_center = None
+        self.rect_size = None
+        self.rect_angle = None
+        self.boxes = None
+
+    def measure(self):
+        """
+        Measure the moments and minimum area rectangles of all contours (once).
+        """
+
+        if (self.m00 is not None):
+            return
+
+        self.measureMoments()
+        self.measureRects()
+
+    def measureMoments(self):
+        """
+        Compute the area moments and centers of mass of all contours.  Many
+        contours are done at once with NumPy: the sums are exact integers
+        scaled the same way as cv2.moments, so the values (and the truncated
+        centers) are the same.
+        """
+
+        count = len(self.contours)
+        if (count < ContourFilter.MIN_CONTOURS):
+            table = numpy.array([self.centerOfMass(cv2.moments(contour)) for contour in self.contours],
+                                dtype=numpy.float64).reshape(-1, 5)
+            (self.m00, self.m10, self.m01, self.cx, self.cy) = table.T
+            return
+
+        vertices = numpy.fromiter((len(contour) for contour in self.contours), dtype=numpy.intp, count=count)
+        starts = numpy.zeros(count, dtype=numpy.intp)
+        numpy.cumsum(vertices[:-1], out=starts[1:])
+
+        points = numpy.concatenate(self.contours).reshape(-1, 2)
+        xs = numpy.ascontiguousarray(points[:, 0], dtype=numpy.int64)
+        ys = numpy.ascontiguousarray(points[:, 1], dtype=numpy.int64)
+
+        following = numpy.arange(1, len(points) + 1)
+        following[starts + vertices - 1] = starts
+        (next_xs, next_ys) = (xs[following], ys[following])
+
+        cross = xs * next_ys - ys * next_xs
+        a00 = numpy.add.reduceat(cross, starts).astype(numpy.float64)
+        a10 = numpy.add.reduceat(cross * (xs + next_xs), starts).astype(numpy.float64)
+        a01 = numpy.add.reduceat(cross * (ys + next_ys), starts).astype(numpy.float64)
+
+        # cv2.moments flips the signs of clockwise contours and zeroes degenerate ones
+        sign = numpy.where(a00 < 0, -1.0, 1.0)
+        sign[numpy.abs(a00) <= numpy.finfo(numpy.float32).eps] = 0.0
+        self.m00 = a00 * (sign * 0.5)
+        self.m10 = a10 * (sign * (1.0 / 6))
+        self.m01 = a01 * (sign * (1.0 / 6))
+
+        valid = (self.m00 != 0)
+        divisor = numpy.where(valid, self.m00, 1.0)
+        self.cx = numpy.trunc(numpy.where(valid, self.m10 / divisor, 0))
+        self.cy = numpy.trunc(numpy.where(valid, self.m01 / divisor, 0))
+
+    @staticmethod
+    def centerOfMass(moments):
+        """
+        Row of (m00, m10, m01, cx, cy) from cv2.moments.
+        """
+
+        m00 = moments["m00"]
+        if (m00 == 0):
+            return (0.0, moments["m10"], moments["m01"], 0, 0)
+
+        return (m00, moments["m10"], moments["m01"], int(moments["m10"] / m00), int(moments["m01"] / m00))
+
+    def measureRects(self):
+        """
+        Find the minimum area rectangles and their corners.  The rectangles
+        are found from the hulls, which have fewer points than the contours.
+        """
+
+        rects = [cv2.minAreaRect(hull) for hull in self.hulls]
+        corners = [cv2.boxPoints(rect) for rect in rects]
+
+        table = numpy.array([center + size + (angle,) for (center, size, angle) in rects], dtype=numpy.float32).reshape(-1, 5)
+        (self.rect_center, self.rect_size, self.rect_angle) = (table[:, 0:2], table[:, 2:4], table[:, 4])
+        self.boxes = numpy.array(corners, dtype=numpy.float32).reshape(-1, 4, 2).astype(numpy.intp)
+
+    def translate(self, dx, dy):
+        """
+        Move the contours (in place) and their features by an offset.
+        """
+
+        offset = numpy.array([dx, dy], dtype=numpy.int32)
+        for contour in self.contours:
+            contour += offset
+        for hull in self.hulls:
+            hull += offset
+
+        self.x += dx
+        self.y += dy
+        self.clearMeasured()
+
+    def select(self, indices):
+        """
+        Table of some of the rows.  Measured features are measured again when
+        needed.
+        """
+
+        selected = copy.copy(self)
+        selected.contours = [self.contours[i] for i in indices]
+        selected.hulls = [self.hulls[i] for i in indices]
+        for name in FILTER_FEATURES:
+            setattr(selected, name, getattr(self, name)[indices])
+        selected.clearMeasured()
+
+        return selected
+
+    @staticmethod
+    def concatenate(tables):
+        """
+        Table of the rows of several tables.
+        """
+
+        joined = ContourFeatures()
+        for table in tables:
+            joined.contours.extend(table.contours)
+            joined.hulls.extend(table.hulls)
+
+        if (tables):
+            for name in FILTER_FEATURES:
+                setattr(joined, name, numpy.concatenate([getattr(table, name) for table in tables]))
+
+        return joined
+
+    def moved(self, indices, motion):
+        """
+        Table of some of the rows moved by the tracker.  Centers and box corners
+        are rounded to the nearest pixel; the contours and hulls are not moved.
+        Args:
+            indices: The rows to keep.
+            motion: The (dx, dy) of each kept row as a numpy.ndarray.
+        """
+
+        self.measure()
+        moved = self.select(indices)
+        for name in MEASURED_FEATURES:
+            setattr(moved, name, getattr(self, name)[indices])
+
+        (dx, dy) = (motion[:, 0], motion[:, 1])
+        moved.x = moved.x + numpy.rint(dx).astype(numpy.int64)
+        moved.y = moved.y + numpy.rint(dy).astype(numpy.int64)
+        moved.m10 = moved.m10 + dx * moved.m00
+        moved.m01 = moved.m01 + dy * moved.m00
+        moved.cx = numpy.rint(moved.cx + dx)
+        moved.cy = numpy.rint(moved.cy + dy)
+        moved.rect_center = (moved.rect_center + motion).astype(numpy.float32)
+        moved.boxes = numpy.rint(moved.boxes + motion[:, numpy.newaxis, :]).astype(numpy.intp)
+
+        return moved
+
+
+class ContourData:
+    """
+    View of one row of a ContourFeatures table (no geometry is copied).
+    """
+
+    __slots__ = ("features", "index", "frame_time", "sequence", "tracked")
+
+    def __init__(self, features, index, frame_time=0, sequence=0, tracked=False):
+        # Feature table of the frame and the row of this contour
+        self.features = features
+        self.index = index
+        # Capture timestamp (microseconds) and sequence number of the frame
+        self.frame_time = frame_time
+        self.sequence = sequence
+        # True if the contour was moved by the target tracker instead of detected
+        self.tracked = tracked
+
+    @property
+    def cx(self):
+        # X coordinate of the contour center
+        return int(self.features.cx[self.index])
+
+    @property
+    def cy(self):
+        # Y coordinate of the contour center
+        return int(self.features.cy[self.index])
+
+    @property
+    def box(self):
+        # Minimum containing box of contour
+        return [self.features.boxes[self.index]]
+
+    @property
+    def area(self):
+        # Area of the contour
+        return float(self.features.m00[self.index])
+
+    # Convert contour data to string
+    def __str__(self):
+        return '{cx: ' + str(self.cx) + ', cy: ' + str(self.cy) + '}'
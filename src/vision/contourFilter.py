@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+
+"""
+----------------------------------------------------------------------------
+Authors:     FRC Team 4145
+
+Description: Vectorized replacement for Pipeline.filter_contours.  Cheap
+             features are computed for every contour at once with NumPy and
+             only the contours that survive them get the expensive perimeter
+             and convex hull calculations.
+----------------------------------------------------------------------------
+"""
+
+import cv2
+import numpy
+
+
+class ContourFilter:
+
+    # Below this many contours the per-contour loop is faster
+    MIN_CONTOURS = 100
+
+    @staticmethod
+    def computeFeatures(input_contours):
+        """
+        Compute the bounding boxes, areas and vertex counts of all contours at once.
+        Args:
+            input_contours: Contours as a list of numpy.ndarray.
+        Returns:
+            Tuple of numpy arrays (x, y, width, height, area, vertices).
+        """
+
+        vertices = numpy.fromiter((len(contour) for contour in input_contours), dtype=numpy.intp, count=len(input_contours))
+        starts = numpy.zeros(len(vertices), dtype=numpy.intp)
+        numpy.cumsum(vertices[:-1], out=starts[1:])
+        ends = starts + vertices - 1
+
+        points = numpy.concatenate(input_contours).reshape(-1, 2)
+        xs = numpy.ascontiguousarray(points[:, 0], dtype=numpy.int64)
+        ys = numpy.ascontiguousarray(points[:, 1], dtype=numpy.int64)
+
+        # Bounding boxes (same convention as cv2.boundingRect)
+        x = numpy.minimum.reduceat(xs, starts)
+        y = numpy.minimum.reduceat(ys, starts)
+        width = numpy.maximum.reduceat(xs, starts) - x + 1
+        height = numpy.maximum.reduceat(ys, starts) - y + 1
+
+        # Shoelace area (exact in 64-bit integers, same as cv2.contourArea)
+        following = numpy.arange(1, len(points) + 1)
+        following[ends] = starts
+        cross = xs * ys[following] - ys * xs[following]
+        area = numpy.abs(numpy.add.reduceat(cross, starts)) * 0.5
+
+        return (x, y, width, height, area, vertices)
+
+    @staticmethod
+    def filter(input_contours, min_area, min_perimeter, min_width, max_width,
+               min_height, max_height, solidity, max_vertex_count, min_vertex_count,
+               min_ratio, max_ratio, features=None):
+        """
+        Filters out contours that do not meet certain criteria.  Takes the same
+        arguments and returns the same contours (and feature rows) as
+        Pipeline.filter_contours.
+        Returns:
+            Contours as a list of numpy.ndarray.
+        """
+
+        if (len(input_contours) == 0):
+            return []
+
+        (x, y, width, height, area, vertices) = ContourFilter.computeFeatures(input_contours)
+
+        # Size checks done by filter_contours before the hull is computed
+        keep = (width >= min_width) & (width <= max_width)
+        keep &= (height >= min_height) & (height <= max_height)
+        keep &= (area >= min_area)
+        candidates = numpy.flatnonzero(keep)
+
+        if (min_perimeter > 0):
+            candidates = numpy.array([i for i in candidates if cv2.arcLength(input_contours[i], True) >= min_perimeter], dtype=numpy.intp)
+
+        # filter_contours divides by the hull area of every contour that reaches the
+        # solidity check, so keep raising for degenerate (zero area) hulls
+        for i in candidates[area[candidates] == 0].tolist():
+            if (cv2.contourArea(cv2.convexHull(input_contours[i])) == 0):
+                raise ZeroDivisionError("float division by zero")
+
+        # Cheap vertex and ratio checks before the expensive hull
+        ratio = width / height
+        keep &= (vertices >= min_vertex_count) & (vertices <= max_vertex_count)
+        keep &= (ratio >= min_ratio) & (ratio <= max_ratio)
+        candidates = candidates[keep[candidates]]
+
+        output = []
+        for (i, contour_area) in zip(candidates.tolist(), area[candidates].tolist()):
+            contour = input_contours[i]
+            hull = cv2.convexHull(contour)
+            hull_area = cv2.contourArea(hull)
+            solid = 100 * contour_area / hull_area
+            if (solid < solidity[0] or solid > solidity[1]):
+                continue
+            output.append(contour)
+            if (features is not None):
+                features.append((x[i], y[i], width[i], height[i], contour_area, hull, hull_area))
+        return output
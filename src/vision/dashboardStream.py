@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+
+"""
+----------------------------------------------------------------------------
+Authors:     FRC Team 4145
+
+Description: Custom dashboard stream output.  The vision loop hands over a
+             downscaled copy of the frame with its results; the overlay is
+             drawn and the frame is sent to the stream on a separate thread,
+             at most STREAM_MAX_FPS times a second and only while a dashboard
+             client is connected.
+----------------------------------------------------------------------------
+"""
+
+import threading
+import time
+import cv2
+import numpy
+from .constants import Constants
+
+
+# Number of downscaled frame buffers (one being drawn, one waiting, one being filled)
+STREAM_BUFFER_COUNT = 3
+
+
+class DashboardStream(threading.Thread):
+
+    def __init__(self, logger, camera_host, scale, max_fps):
+        threading.Thread.__init__(self, name="DashboardStream", daemon=True)
+        self.logger = logger
+        self.camera_host = camera_host
+        self.scale = scale
+        self.max_fps = max_fps
+
+        self.buffers = [None] * STREAM_BUFFER_COUNT
+        self.free = list(range(STREAM_BUFFER_COUNT))
+
+        # Latest submitted (buffer index, contour_data) waiting to be drawn
+        self.pending = None
+        self.condition = threading.Condition()
+        self.running = True
+
+        self.next_frame_time = 0.0
+
+        # Frame counters
+        self.submitted = 0
+        self.sent = 0
+        self.skipped = 0
+
+    @staticmethod
+    def streamSize(width, height):
+        """
+        Size of the stream for a camera of the given size.
+        """
+
+        if (width is None or height is None or not Constants.ENABLE_DASHBOARD_STREAM):
+            return (width, height)
+
+        return (max(width // Constants.STREAM_SCALE, 1), max(height // Constants.STREAM_SCALE, 1))
+
+    def clientConnected(self):
+        """
+        Check if a dashboard is streaming the output source.
+        """
+
+        cv_source = self.camera_host.cv_source
+        return (cv_source is not None and cv_source.isEnabled())
+
+    def submit(self, frame, contour_data):
+        """
+        Hand a frame and its results to the stream.  The frame is copied (while
+        downscaling) so the caller can reuse it.
+        :return: True if the frame will be sent
+        """
+
+        now = time.monotonic()
+        if (now < self.next_frame_time or not self.clientConnected()):
+            self.skipped += 1
+            return False
+        self.next_frame_time = now + 1.0 / self.max_fps
+
+        with self.condition:
+            if (self.pending is not None):
+                # Replace the frame that has not been drawn yet
+                (index, data) = self.pending
+                self.pending = None
+                self.skipped += 1
+            elif (self.free):
+                index = self.free.pop()
+            else:
+                self.skipped += 1
+                return False
+
+        (height, width) = frame.shape[:2]
+        size = (max(width // self.scale, 1), max(height // self.scale, 1))
+        buffer = self.buffers[index]
+        if (buffer is None or buffer.shape[:2] != (size[1], size[0])):
+            buffer = numpy.empty((size[1], size[0], 3), dtype=numpy.uint8)
+            self.buffers[index] = buffer
+        cv2.resize(frame, size, dst=buffer, interpolation=cv2.INTER_NEAREST)
+
+        with self.condition:
+            self.pending = (index, contour_data)
+            self.submitted += 1
+            self.condition.notify()
+
+        return True
+
+    def run(self):
+        """
+        Draw and send submitted frames.
+        """
+
+        while True:
+            with self.condition:
+                while (self.running and self.pending is None):
+                    self.condition.wait()
+                if (not self.running):
+                    break
+
+                (index, contour_data) = self.pending
+                self.pending = None
+
+            frame = self.buffers[index]
+            for contour in contour_data:
+                box = [numpy.intp(contour.box[0] / self.scale)]
+                cv2.drawContours(frame, box, -1, (255, 0, 0), 1)
+
+            self.camera_host.outputVisionFrame(frame)
+            self.sent += 1
+
+            with self.condition:
+                self.free.append(index)
+
+    def stop(self, timeout=None):
+        """
+        Stop the thread.
+        """
+
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+
+        self.join(timeout)
+
+    def getStats(self):
+        """
+        Get the frame counters.
+        """
+
+        return {"submitted": self.submitted, "sent": self.sent, "skipped": self.skipped}
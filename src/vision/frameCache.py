@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+
+"""
+----------------------------------------------------------------------------
+Authors:     FRC Team 4145
+
+Description: Per-frame cache of intermediate images shared by the pipelines
+             of several target types.  The HSV conversion and the downscaled
+             copies of an image are computed by the first pipeline that needs
+             them and reused by the others.
+
+Comments:    Images are identified by their memory (address, shape and
+             strides), so a region of the frame is a different image than the
+             whole frame.  reset() must be called for every new frame.
+----------------------------------------------------------------------------
+"""
+
+import cv2
+from .bufferPool import BufferPool
+
+
+class FrameCache:
+
+    def __init__(self):
+        self.buffer_pool = BufferPool()
+
+        # Image key -> HSV conversion, (image key, scale) -> downscaled copy
+        self.hsv_images = {}
+        self.scaled_images = {}
+
+        # Conversions computed and reused (counted for benchmarks)
+        self.computed = 0
+        self.reused = 0
+
+    def reset(self):
+        """
+        Forget the images of the last frame (the buffers are kept).
+        """
+
+        self.hsv_images.clear()
+        self.scaled_images.clear()
+
+    @staticmethod
+    def imageKey(image):
+        """
+        Key identifying the memory of an image.
+        """
+
+        return (image.__array_interface__["data"][0], image.shape, image.strides)
+
+    def hsv(self, image):
+        """
+        Get the HSV conversion of a BGR image.
+        """
+
+        key = self.imageKey(image)
+        hsv = self.hsv_images.get(key)
+        if (hsv is not None):
+            self.reused += 1
+            return hsv
+
+        hsv = self.buffer_pool.get("hsv{}".format(len(self.hsv_images)), image.shape)
+        cv2.cvtColor(image, cv2.COLOR_BGR2HSV, dst=hsv)
+        self.hsv_images[key] = hsv
+        self.computed += 1
+
+        return hsv
+
+    def scaled(self, image, scale):
+        """
+        Get a copy of an image downscaled by a factor (INTER_LINEAR).
+        """
+
+        key = (self.imageKey(image), scale)
+        small = self.scaled_images.get(key)
+        if (small is not None):
+            self.reused += 1
+            return small
+
+        (height, width) = image.shape[:2]
+        size = (max(width // scale, 1), max(height // scale, 1))
+        small = self.buffer_pool.get("scaled{}".format(len(self.scaled_images)), (size[1], size[0]) + image.shape[2:])
+        cv2.resize(image, size, dst=small, interpolation=cv2.INTER_LINEAR)
+        self.scaled_images[key] = small
+        self.computed += 1
+
+        return small
+
+    def threshold(self, image, hue, sat, val, dst=None):
+        """
+        Threshold the cached HSV conversion of an image (same output as
+        Pipeline.hsv_threshold).
+        """
+
+        return cv2.inRange(self.hsv(image), (hue[0], sat[0], val[0]), (hue[1], sat[1], val[1]), dst=dst)
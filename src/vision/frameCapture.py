@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+
+"""
+----------------------------------------------------------------------------
+Authors:     FRC Team 4145
+
+Description: Background capture thread that continuously grabs camera frames
+             into a small ring of preallocated buffers so that frame capture
+             and pipeline processing can run at the same time.
+----------------------------------------------------------------------------
+"""
+
+import threading
+import numpy
+
+
+class FrameCapture(threading.Thread):
+
+    # Minimum number of buffers (one being written, one latest, one being read)
+    MIN_BUFFER_COUNT = 3
+
+    def __init__(self, logger, cv_sink, width, height, buffer_count):
+        threading.Thread.__init__(self, name="FrameCapture", daemon=True)
+        self.logger = logger
+        self.cv_sink = cv_sink
+
+        # Preallocate the frame ring (allocated by the first grab if the size is unknown)
+        buffer_count = max(buffer_count, self.MIN_BUFFER_COUNT)
+        if (width is not None and height is not None):
+            self.buffers = [numpy.zeros((height, width, 3), dtype=numpy.uint8) for i in range(buffer_count)]
+        else:
+            self.buffers = [None] * buffer_count
+
+        self.condition = threading.Condition()
+        self.running = False
+
+        # Index of the most recently captured buffer
+        self.latest_index = None
+        # Index of the buffer currently handed out to the reader
+        self.reader_index = None
+        # Capture timestamp of the latest frame
+        self.latest_time = 0
+        # Number of frames captured so far
+        self.sequence = 0
+
+    def start(self):
+        """
+        Start capturing frames in the background.
+        """
+
+        self.running = True
+        threading.Thread.start(self)
+
+    def stop(self):
+        """
+        Stop capturing frames.
+        """
+
+        self.running = False
+
+    def run(self):
+        """
+        Continuously grab frames into the next free buffer of the ring.
+        """
+
+        while (self.running):
+            index = self.nextWriteIndex()
+
+            (frame_time, frame) = self.cv_sink.grabFrame(self.buffers[index])
+            if (frame_time == 0):
+                self.logger.logMessage("Frame capture error: " + str(self.cv_sink.getError()), True)
+                continue
+
+            with self.condition:
+                # grabFrame only allocates when the buffer is missing or the wrong size
+                self.buffers[index] = frame
+                self.latest_index = index
+                self.latest_time = frame_time
+                self.sequence += 1
+                self.condition.notify_all()
+
+    def nextWriteIndex(self):
+        """
+        Find a buffer that is neither the latest frame nor held by the reader.
+        """
+
+        with self.condition:
+            for index in range(len(self.buffers)):
+                if (index != self.latest_index and index != self.reader_index):
+                    return index
+
+    def read(self, last_sequence=None, timeout=None):
+        """
+        Return the latest captured frame without waiting for a new capture.
+        :param last_sequence: If set, wait up to timeout for a frame newer than this sequence
+        :param timeout: Maximum time in seconds to wait for a newer frame
+        :return: Tuple of (frame, frame_time, sequence)
+        """
+
+        with self.condition:
+            if (last_sequence is not None):
+                self.condition.wait_for(lambda: self.sequence != last_sequence, timeout)
+
+            if (self.latest_index is None):
+                return (None, 0, 0)
+
+            # The reader keeps this buffer until its next read
+            self.reader_index = self.latest_index
+
+            return (self.buffers[self.reader_index], self.latest_time, self.sequence)
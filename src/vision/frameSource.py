@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+
+"""
+----------------------------------------------------------------------------
+Authors:     FRC Team 4145
+
+Description: Frame sources for the VisionProcessor.  Frames can come from
+             the cscore camera, from recorded images or video, or from a
+             memory-mapped file of raw frames for load testing.
+----------------------------------------------------------------------------
+"""
+
+import os
+import time
+import cv2
+import numpy
+
+
+# Image file extensions loaded from a directory of recorded frames
+IMAGE_EXTENSIONS = (".jpeg", ".jpg", ".png", ".bmp")
+
+# Frames older than this (seconds) mean the frame time is on another clock
+MAX_FRAME_AGE = 10.0
+
+
+class FrameSource:
+    """
+    Base class of all frame sources.
+    """
+
+    def __init__(self, fps=None):
+        # Maximum rate frames are handed out (None or 0 for as fast as possible)
+        self.fps = fps
+        self.next_frame_time = None
+        self.sequence = 0
+
+    def readFrame(self):
+        """
+        Read the next frame.
+        :return: Tuple of (frame, frame_time, sequence), frame is None if there is no frame
+        """
+
+        raise NotImplementedError
+
+    def close(self):
+        """
+        Release the resources of the source.
+        """
+
+        pass
+
+    def waitForFrame(self):
+        """
+        Sleep until the next frame is due and return its timestamp (microseconds,
+        the same unit cscore uses for frame times).
+        """
+
+        now = time.monotonic()
+        if (self.fps):
+            if (self.next_frame_time is not None and now < self.next_frame_time):
+                time.sleep(self.next_frame_time - now)
+                now = self.next_frame_time
+            self.next_frame_time = now + 1.0 / self.fps
+
+        self.sequence += 1
+
+        return int(now * 1000000)
+
+
+class FrameClock:
+    """
+    Converts frame times to ages.  cscore stamps frames with its steady clock
+    in microseconds, which is CLOCK_MONOTONIC on Linux, but other builds and
+    drivers may use the wall clock or their own epoch.  The clock is worked
+    out from the first frame and kept for the following frames.
+    """
+
+    def __init__(self, logger):
+        self.logger = logger
+        # Seconds added to a frame time to put it on time.monotonic() (None until the first frame)
+        self.offset = None
+        # True if the offset is estimated from the frames (frame clock with an unknown epoch)
+        self.estimated = False
+        # True once a frame with an impossible age has been logged
+        self.warned = False
+
+    def frameAge(self, frame_time, now):
+        """
+        Time since a frame was captured.
+        :param frame_time: Capture timestamp of the frame (microseconds)
+        :param now: Current time of time.monotonic() (seconds)
+        :return: The age in seconds, or None if it cannot be computed
+        """
+
+        if (frame_time <= 0):
+            return None
+
+        seconds = frame_time / 1000000.0
+        if (self.offset is None):
+            self.offset = self.estimateOffset(seconds, now)
+
+        age = now - (seconds + self.offset)
+        if (age < 0 and self.estimated):
+            # Fresher than any frame so far, ages are measured from the freshest frame
+            self.offset += age
+            age = 0.0
+
+        if (age < 0 or age > MAX_FRAME_AGE):
+            if (not self.warned):
+                self.logger.logMessage("Frame time {} is {:.3f} s from the frame clock, latency is not published "
+                                       "for such frames".format(frame_time, age))
+                self.warned = True
+            return None
+
+        return age
+
+    def estimateOffset(self, seconds, now):
+        """
+        Find the clock of the frame times from the first frame.
+        :return: The offset from the frame clock to time.monotonic() (seconds)
+        """
+
+        if (0 <= now - seconds <= MAX_FRAME_AGE):
+            return 0.0
+
+        # Wall clock frame times
+        offset = now - time.time()
+        if (0 <= now - (seconds + offset) <= MAX_FRAME_AGE):
+            self.logger.logMessage("Frame times are on the wall clock")
+            return offset
+
+        # Unknown epoch: ages are measured from the freshest frame, so the
+        # latency misses the age of that frame
+        self.logger.logMessage("Frame times are not on the monotonic or wall clock, latency is measured "
+                               "from the freshest frame")
+        self.estimated = True
+        return now - seconds
+
+
+class CameraFrameSource(FrameSource):
+    """
+    Frames from the vision camera of a CameraHost.
+    """
+
+    def __init__(self, camera_host):
+        FrameSource.__init__(self)
+        self.camera_host = camera_host
+
+    def readFrame(self):
+        return self.camera_host.readLatestFrame()
+
+
+class FileFrameSource(FrameSource):
+    """
+    Frames from a directory of images or a video file, loaded into memory.
+    """
+
+    def __init__(self, path, fps=None, loop=True, limit=None):
+        FrameSource.__init__(self, fps)
+        self.loop = loop
+        self.frames = self.loadFrames(path, limit)
+        self.index = 0
+
+    @staticmethod
+    def loadFrames(path, limit=None):
+        """
+        Load frames from a directory of images (searched recursively, e.g. the
+        USB drive's images folder) or a video file.
+        """
+
+        frames = []
+
+        if (os.path.isdir(path)):
+            names = []
+            for (root, dirs, files) in os.walk(path):
+                for name in files:
+                    if (name.lower().endswith(IMAGE_EXTENSIONS)):
+                        names.append(os.path.join(root, name))
+
+            for name in sorted(names):
+                if (limit is not None and len(frames) >= limit):
+                    break
+                frame = cv2.imread(name)
+                if (frame is not None):
+                    frames.append(frame)
+        else:
+            capture = cv2.VideoCapture(path)
+            while (limit is None or len(frames) < limit):
+                (ok, frame) = capture.read()
+                if (not ok):
+                    break
+                frames.append(frame)
+            capture.release()
+
+        # Frames are reused every loop, so nothing may draw on them
+        for frame in frames:
+            frame.flags.writeable = False
+
+        return frames
+
+    def readFrame(self):
+        if (self.index >= len(self.frames)):
+            if (not self.loop or len(self.frames) == 0):
+                return (None, 0, self.sequence)
+            self.index = 0
+
+        frame = self.frames[self.index]
+        self.index += 1
+
+        frame_time = self.waitForFrame()
+        return (frame, frame_time, self.sequence)
+
+
+class RawFrameSource(FrameSource):
+    """
+    Frames from a file of fixed-size raw BGR frames.  Frames are zero-copy
+    views into the memory-mapped file.
+    """
+
+    def __init__(self, path, width, height, fps=None, loop=True):
+        FrameSource.__init__(self, fps)
+        self.loop = loop
+
+        frame_size = width * height * 3
+        count = os.path.getsize(path) // frame_size
+
+        # Read-only, frames are reused every loop
+        self.frames = numpy.memmap(path, dtype=numpy.uint8, mode="r", shape=(count, height, width, 3))
+        self.index = 0
+
+    @staticmethod
+    def writeRawFile(path, frames):
+        """
+        Write frames (all the same size) to a raw frame file.
+        """
+
+        with open(path, "wb") as f:
+            for frame in frames:
+                f.write(numpy.ascontiguousarray(frame).tobytes())
+
+    def readFrame(self):
+        if (self.index >= len(self.frames)):
+            if (not self.loop or len(self.frames) == 0):
+                return (None, 0, self.sequence)
+            self.index = 0
+
+        frame = self.frames[self.index]
+        self.index += 1
+
+        frame_time = self.waitForFrame()
+        return (frame, frame_time, self.sequence)
+
+    def close(self):
+        self.frames = None
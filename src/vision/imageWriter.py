@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+
+"""
+----------------------------------------------------------------------------
+Authors:     FRC Team 4145
+
+Description: Background image writer.  JPEG encoding and writing to the USB
+             drive happen on a separate thread so that saving images does
+             not slow down the vision loop.
+----------------------------------------------------------------------------
+"""
+
+import queue
+import threading
+from cv2 import drawContours, imwrite
+
+
+# Drop policies used when the queue is full
+DROP_OLDEST = "oldest"
+DROP_NEWEST = "newest"
+
+
+class ImageWriter(threading.Thread):
+
+    def __init__(self, queue_size, drop_policy):
+        threading.Thread.__init__(self, name="ImageWriter", daemon=True)
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.drop_policy = drop_policy
+
+        # Frame counters
+        self.queued = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def submit(self, name, frame, boxes=()):
+        """
+        Queue a copy of the frame to be written to the given file.
+        :param boxes: Target boxes drawn on the copy before it is written
+        :return: True if the frame was queued
+        """
+
+        if (self.queue.full()):
+            if (self.drop_policy == DROP_NEWEST):
+                self.dropped += 1
+                return False
+
+            try:
+                self.queue.get_nowait()
+                self.dropped += 1
+            except queue.Empty:
+                pass
+
+        try:
+            self.queue.put_nowait((name, frame.copy(), boxes))
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+        self.queued += 1
+        return True
+
+    def run(self):
+        """
+        Continuously encode and write queued frames.
+        """
+
+        while True:
+            item = self.queue.get()
+            if (item is None):
+                break
+
+            (name, frame, boxes) = item
+            if (len(boxes) > 0):
+                drawContours(frame, boxes, -1, (255, 0, 0), 2)
+
+            if (imwrite(name, frame)):
+                self.written += 1
+            else:
+                self.failed += 1
+
+    def stop(self, timeout=None):
+        """
+        Write the frames that are still queued, then stop the thread.
+        """
+
+        self.queue.put(None)
+        self.join(timeout)
+
+    def getStats(self):
+        """
+        Get the frame counters.
+        """
+
+        return {"queued": self.queued, "written": self.written, "dropped": self.dropped,
+                "failed": self.failed, "pending": self.queue.qsize()}
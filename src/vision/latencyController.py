@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+
+"""
+----------------------------------------------------------------------------
+Authors:     FRC Team 4145
+
+Description: Adaptive latency control.  Watches recent frame processing
+             times and steps through degradation levels when they exceed the
+             latency budget, then steps back up when there is headroom.
+
+Comments:    Levels (published to NetworkTables as 'latency_level'):
+               0 - full processing
+               1 - custom stream output skipped
+               2 - also processed at 1 / LATENCY_SCALE resolution
+               3 - also skipping LATENCY_SKIP_FRAMES frames per processed frame
+----------------------------------------------------------------------------
+"""
+
+import numpy
+from .constants import Constants
+
+
+LEVEL_FULL = 0
+LEVEL_NO_STREAM = 1
+LEVEL_LOW_RESOLUTION = 2
+LEVEL_SKIP_FRAMES = 3
+
+
+class LatencyController:
+
+    def __init__(self, logger, connection, budget):
+        self.logger = logger
+        self.connection = connection
+        # Per-frame processing time budget (seconds)
+        self.budget = budget
+
+        self.level = LEVEL_FULL
+
+        # Processing times measured at the current level
+        self.samples = []
+        self.skipped = 0
+
+        self.publishLevel()
+
+    def streamEnabled(self):
+        """
+        Check if the custom stream should be output.
+        """
+
+        return self.level < LEVEL_NO_STREAM
+
+    def processScale(self):
+        """
+        Downscale factor used to process frames.
+        """
+
+        if (self.level >= LEVEL_LOW_RESOLUTION):
+            return Constants.LATENCY_SCALE
+
+        return 1
+
+    def skipFrame(self):
+        """
+        Check if the next frame should be dropped without processing.
+        """
+
+        if (self.level < LEVEL_SKIP_FRAMES or self.skipped >= Constants.LATENCY_SKIP_FRAMES):
+            self.skipped = 0
+            return False
+
+        self.skipped += 1
+        return True
+
+    def recordFrame(self, process_time):
+        """
+        Record the processing time of a frame and change the level once a full
+        window of frames has been measured at the current level.
+        :return: True if the level changed
+        """
+
+        self.samples.append(process_time)
+        if (len(self.samples) < Constants.LATENCY_WINDOW):
+            return False
+
+        recent = numpy.percentile(self.samples, 90)
+        self.samples = []
+
+        if (recent > self.budget and self.level < LEVEL_SKIP_FRAMES):
+            self.setLevel(self.level + 1, recent)
+            return True
+
+        if (recent < self.budget * Constants.LATENCY_HEADROOM and self.level > LEVEL_FULL):
+            self.setLevel(self.level - 1, recent)
+            return True
+
+        return False
+
+    def setLevel(self, level, recent):
+        """
+        Change the level and publish it.
+        """
+
+        self.logger.logMessage("Latency level {} -> {} (p90 {:.1f} ms, budget {:.1f} ms)".format(
+            self.level, level, recent * 1000, self.budget * 1000))
+
+        self.level = level
+        self.skipped = 0
+        self.publishLevel()
+
+    def publishLevel(self):
+        """
+        Publish the current level to the 'vision' network table.
+        """
+
+        if (self.connection is not None):
+            self.connection.publishValue("latency_level", self.level)
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+
+"""
+----------------------------------------------------------------------------
+Authors:     FRC Team 4145
+
+Description: Buffered log writer.  Log lines are collected in memory and
+             written to the USB drive in batches by a background thread,
+             either every flush interval or once enough text is waiting.
+             Log files are rotated by size.
+----------------------------------------------------------------------------
+"""
+
+import os
+import threading
+
+
+class LogWriter(threading.Thread):
+
+    def __init__(self, path, flush_interval, flush_size, max_bytes, backup_count):
+        threading.Thread.__init__(self, name="LogWriter", daemon=True)
+        self.path = path
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.running = False
+
+        # Lines waiting to be written
+        self.lines = []
+        self.pending_bytes = 0
+
+        self.file = None
+
+    def start(self):
+        """
+        Start flushing in the background.
+        """
+
+        self.running = True
+        threading.Thread.start(self)
+
+    def write(self, line):
+        """
+        Add a line to the buffer.  The background thread writes it later.
+        """
+
+        with self.lock:
+            self.lines.append(line)
+            self.pending_bytes += len(line)
+            full = self.pending_bytes >= self.flush_size
+
+        if (full):
+            self.wake.set()
+
+    def run(self):
+        """
+        Flush the buffer every flush interval or when it is full.
+        """
+
+        while (self.running):
+            self.wake.wait(self.flush_interval)
+            self.wake.clear()
+            self.flush()
+
+    def flush(self):
+        """
+        Write all buffered lines to the log file.
+        """
+
+        with self.lock:
+            lines = self.lines
+            self.lines = []
+            self.pending_bytes = 0
+
+        if (len(lines) == 0):
+            return
+
+        try:
+            if (self.file is None):
+                self.file = open(self.path, "a+")
+
+            self.file.write("".join(lines))
+            self.file.flush()
+
+            if (self.file.tell() >= self.max_bytes):
+                self.rotate()
+        except OSError as err:
+            print("Could not write log '{}': {}".format(self.path, err))
+            self.file = None
+
+    def rotate(self):
+        """
+        Rename log.txt to log.1.txt (log.1.txt to log.2.txt, ...) and start a new file.
+        """
+
+        self.file.close()
+        self.file = None
+
+        (root, ext) = os.path.splitext(self.path)
+        for i in range(self.backup_count - 1, 0, -1):
+            source = "{}.{}{}".format(root, i, ext)
+            if (os.path.exists(source)):
+                os.replace(source, "{}.{}{}".format(root, i + 1, ext))
+
+        if (self.backup_count > 0):
+            os.replace(self.path, "{}.1{}".format(root, ext))
+        else:
+            os.remove(self.path)
+
+    def close(self):
+        """
+        Stop the background thread and write everything still buffered.
+        """
+
+        self.running = False
+        self.wake.set()
+        if (self.is_alive()):
+            self.join()
+
+        self.flush()
+        if (self.file is not None):
+            self.file.close()
+            self.file = None
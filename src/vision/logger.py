@@ -30,13 +30,54 @@ class Logger:
 
             print(message)
 
-    def saveFrame(self, frame):
+    def saveFrame(self, frame, contour_data=()):
         """
         Save the frame to the USB drive.
+        :param contour_data: Targets whose boxes are drawn on the saved image
         """
 
-        (name, write) = self.usbDrive.saveFrame(frame)
+        if (self.usbDrive is None):
+            return
+
+        (name, write) = self.usbDrive.saveFrame(frame, contour_data)
 
         if (name is not None):
             self.logMessage("Saving Frame: " + str(name), True)
-            self.logMessage("Write: " + str(write), True)
+            self.logMessage("Queued: " + str(write) + " " + str(self.getImageStats()), True)
+
+    def logTiming(self, rows):
+        """
+        Append timing summary rows to the timing CSV on the USB drive.
+        """
+
+        if (self.usbDrive != None):
+            self.usbDrive.logTiming(rows)
+
+    def recordFrame(self, frame, frame_time, sequence, contour_data):
+        """
+        Record the frame in the black box on the USB drive.
+        """
+
+        if (self.usbDrive != None):
+            self.usbDrive.recordFrame(frame, frame_time, sequence, contour_data)
+
+    def triggerBlackBox(self, reason):
+        """
+        Save the recent black box frames on the USB drive.
+        :return: True if a save was started
+        """
+
+        if (self.usbDrive is None):
+            return False
+
+        return self.usbDrive.triggerBlackBox(reason)
+
+    def getImageStats(self):
+        """
+        Get the counters of queued, written and dropped images.
+        """
+
+        if (self.usbDrive is None):
+            return None
+
+        return self.usbDrive.getImageStats()
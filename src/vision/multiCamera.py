@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+
+"""
+----------------------------------------------------------------------------
+Authors:     FRC Team 4145
+
+Description: Runs every configured camera in its own worker process, each
+             with its own Pipeline, so cameras do not share the GIL and a
+             slow camera cannot stall the others.
+----------------------------------------------------------------------------
+"""
+
+import multiprocessing
+import time
+from .cameraHost import CameraHost
+from .connection import Connection
+from .constants import Constants
+from .logger import Logger
+from .visionProcessor import VisionProcessor
+
+
+# Seconds between checks that every camera worker is still alive
+WORKER_CHECK_INTERVAL = 1.0
+
+
+class CameraWorker(multiprocessing.Process):
+
+    def __init__(self, usb_drive, config, camera_index):
+        camera_name = config.camera_configs[camera_index].name
+        multiprocessing.Process.__init__(self, name="CameraWorker-" + camera_name, daemon=True)
+
+        self.usb_drive = usb_drive
+        self.config = config
+        self.camera_index = camera_index
+        self.camera_name = camera_name
+
+    def run(self):
+        """
+        Start the camera and continuously process its vision pipeline.
+        """
+
+        logger = Logger(self.usb_drive)
+
+        # The parent process hosts the NetworkTables server in server mode
+        client_address = None
+        if (self.config.server):
+            client_address = "127.0.0.1"
+
+        connection = Connection(logger, False, self.config.team, self.camera_name, client_address, new_instance=True)
+
+        camera_host = CameraHost(logger, self.config.camera_configs, connection, self.camera_index,
+                                 Constants.STREAM_BASE_PORT + self.camera_index)
+
+        vision_processor = VisionProcessor(logger, connection, camera_host)
+
+        try:
+            while True:
+                vision_processor.processVision()
+        finally:
+            # atexit handlers do not run in worker processes
+            if (self.usb_drive is not None):
+                self.usb_drive.close()
+
+
+class MultiCameraHost:
+
+    def __init__(self, logger, config, usb_drive):
+        self.logger = logger
+        self.config = config
+        self.usb_drive = usb_drive
+        self.workers = []
+        self.connection = None
+
+    def start(self):
+        """
+        Start one worker process per configured camera.
+        """
+
+        if (self.config.server):
+            self.connection = Connection(self.logger, True, self.config.team)
+
+        for camera_index in range(len(self.config.camera_configs)):
+            self.workers.append(self.startWorker(camera_index))
+
+    def startWorker(self, camera_index):
+        """
+        Start the worker process for a single camera.
+        """
+
+        worker = CameraWorker(self.usb_drive, self.config, camera_index)
+        self.logger.logMessage("Starting worker for camera '{}'".format(worker.camera_name))
+        worker.start()
+
+        return worker
+
+    def run(self):
+        """
+        Start the workers and restart any worker that exits.
+        """
+
+        self.start()
+
+        while True:
+            time.sleep(WORKER_CHECK_INTERVAL)
+
+            for i in range(len(self.workers)):
+                worker = self.workers[i]
+                if (not worker.is_alive()):
+                    self.logger.logMessage("Worker for camera '{}' exited with code {}".format(worker.camera_name, worker.exitcode))
+                    self.workers[i] = self.startWorker(worker.camera_index)
@@ -13,7 +13,15 @@ Description: This script uses a generated CV2 pipeline to process a camera
 import cv2
 import numpy
 import math
+import os
 from enum import Enum
+from .bufferPool import BufferPool
+from .componentDetector import ComponentDetector
+from .constants import Constants
+from .contourFeatures import ContourFeatures
+from .contourFilter import ContourFilter
+from .pipelineGraph import PipelineGraph
+from .pyramidDetector import PyramidDetector
 
 
 class Pipeline:
@@ -66,15 +74,73 @@ class Pipeline:
         self.filter_contours_contours = self.find_contours_output
         self.filter_contours_output = None
 
+        # Features of the filtered contours (see ContourFeatures)
+        self.filter_contours_features = None
+
+        # Lean execution (reuse one buffer per stage instead of allocating every frame)
+        self.lean = Constants.ENABLE_LEAN_PIPELINE
+        self.keep_intermediates = Constants.KEEP_PIPELINE_INTERMEDIATES
+        self.buffer_pool = BufferPool()
+
+        # Capture timestamp (microseconds) and sequence number of the frame being processed
+        self.frame_time = 0
+        self.frame_sequence = 0
+
+        # Downscale factor of the image passed to find_contours (see process_scaled)
+        self.detection_scale = 1
+
+        # Optional StageTimer used to time each lean pipeline stage
+        self.timer = None
+
+        # Optional FrameCache shared with the pipelines of other target types
+        self.frame_cache = None
+
+        # Use the vectorized contour filter (same output as filter_contours)
+        if (Constants.ENABLE_VECTORIZED_FILTER):
+            self.filter_contours = self.filter_contours_vectorized
+
+        # Detect blobs with connected components instead of tracing every contour
+        if (Constants.DETECTION_BACKEND == "components"):
+            self.find_contours = self.find_component_contours
+
+        # Run the image stages from a declarative step graph
+        self.graph = None
+        self.graph_program = None
+        if (Constants.ENABLE_PIPELINE_GRAPH):
+            self.graph = PipelineGraph.load(os.path.join(os.path.dirname(__file__), Constants.PIPELINE_GRAPH_FILE))
+            self.graph.applyParams(self)
+            self.compile_graph()
+
+    def compile_graph(self):
+        """
+        Compile the step graph with the current parameter values.
+        """
+
+        self.graph_program = self.graph.compile(self, Constants.ENABLE_GRAPH_OPTIMIZER)
+
+    def invalidate(self, names):
+        """
+        Update the state derived from parameters that changed between frames.
+        Args:
+            names: The names of the changed parameters (e.g. hsv_threshold_hue).
+        """
+
+        # Compiled steps hold parameter values (and fusion depends on them)
+        if (self.graph is not None):
+            self.compile_graph()
 
     def process(self, source):
         """
         Runs the pipeline and sets all outputs to new values.
         """
 
+        if (self.lean or self.graph_program is not None):
+            self.process_lean(source)
+            return
+
         # Step HSV Threshold: Filter out image by HSV color values
         self.hsv_threshold_input = source
-        (self.hsv_threshold_output) = self.hsv_threshold(self.hsv_threshold_input, self.hsv_threshold_hue, self.hsv_threshold_saturation, self.hsv_threshold_value)
+        (self.hsv_threshold_output) = self.threshold(self.hsv_threshold_input, self.hsv_threshold_hue, self.hsv_threshold_saturation, self.hsv_threshold_value, None)
 
         # Step CV Erode: Filter out noise from image
         self.cv_erode_src = self.hsv_threshold_output
@@ -91,11 +157,186 @@ class Pipeline:
 
         # Step Filter Contours: Filter out contours that are too small/large/etc
         self.filter_contours_contours = self.find_contours_output
-        (self.filter_contours_output) = self.filter_contours(self.filter_contours_contours, self.filter_contours_min_area, self.filter_contours_min_perimeter, self.filter_contours_min_width, self.filter_contours_max_width, self.filter_contours_min_height, self.filter_contours_max_height, self.filter_contours_solidity, self.filter_contours_max_vertices, self.filter_contours_min_vertices, self.filter_contours_min_ratio, self.filter_contours_max_ratio)
+        rows = []
+        (self.filter_contours_output) = self.filter_contours(self.filter_contours_contours, self.filter_contours_min_area, self.filter_contours_min_perimeter, self.filter_contours_min_width, self.filter_contours_max_width, self.filter_contours_min_height, self.filter_contours_max_height, self.filter_contours_solidity, self.filter_contours_max_vertices, self.filter_contours_min_vertices, self.filter_contours_min_ratio, self.filter_contours_max_ratio, features=rows)
+        self.filter_contours_features = ContourFeatures(self.filter_contours_output, rows)
+
+
+    def process_lean(self, source):
+        """
+        Runs the pipeline using preallocated buffers for every image stage.
+        Intermediates are only kept on the object when keep_intermediates is set.
+        """
+
+        contours = self.process_detection(source)
+        self.process_filter(contours)
+
+
+    def process_detection(self, source):
+        """
+        Runs the image stages of the lean pipeline (threshold through find contours).
+        Returns:
+            The unfiltered contours as a list of numpy.ndarray.
+        """
+
+        if (self.graph_program is not None):
+            return self.graph_program.run(source, self.timer)
+
+        timer = self.timer
+        if (timer is not None):
+            start = timer.now()
+
+        (height, width) = source.shape[:2]
+        threshold = self.buffer_pool.get("hsv_threshold", (height, width))
+        erode = self.buffer_pool.get("cv_erode", (height, width))
+        mask = self.buffer_pool.get("mask", (height, width))
+
+        # Step HSV Threshold: Filter out image by HSV color values
+        self.threshold(source, self.hsv_threshold_hue, self.hsv_threshold_saturation, self.hsv_threshold_value, threshold)
+        if (timer is not None):
+            start = timer.record("hsv_threshold", start)
+
+        # Step CV Erode: Filter out noise from image
+        self.cv_erode(threshold, self.cv_erode_kernel, self.cv_erode_anchor, self.cv_erode_iterations, self.cv_erode_bordertype, self.cv_erode_bordervalue, erode)
+        if (timer is not None):
+            start = timer.record("cv_erode", start)
+
+        # Step Mask: Remove the noise using the CV Errode output
+        self.mask(erode, threshold, mask)
+        if (timer is not None):
+            start = timer.record("mask", start)
+
+        # Step Find Contours: Find solid areas of the filtered image
+        contours = self.find_contours(mask, self.find_contours_external_only)
+        if (timer is not None):
+            timer.record("find_contours", start)
+
+        if (self.keep_intermediates):
+            self.hsv_threshold_input = source
+            self.hsv_threshold_output = threshold
+            self.cv_erode_src = threshold
+            self.cv_erode_output = erode
+            self.mask_input = erode
+            self.mask_mask = threshold
+            self.mask_output = mask
+            self.find_contours_input = mask
+            self.find_contours_output = contours
+
+        return contours
+
+
+    def process_filter(self, contours):
+        """
+        Runs the filter contours stage and sets filter_contours_output.
+        """
+
+        timer = self.timer
+        if (timer is not None):
+            start = timer.now()
+
+        # Step Filter Contours: Filter out contours that are too small/large/etc
+        rows = []
+        (self.filter_contours_output) = self.filter_contours(contours, self.filter_contours_min_area, self.filter_contours_min_perimeter, self.filter_contours_min_width, self.filter_contours_max_width, self.filter_contours_min_height, self.filter_contours_max_height, self.filter_contours_solidity, self.filter_contours_max_vertices, self.filter_contours_min_vertices, self.filter_contours_min_ratio, self.filter_contours_max_ratio, features=rows)
+        self.filter_contours_features = ContourFeatures(self.filter_contours_output, rows)
+
+        if (timer is not None):
+            timer.record("filter_contours", start)
+
+        if (self.keep_intermediates):
+            self.filter_contours_contours = contours
+
+
+    def process_region(self, source, x, y, width, height):
+        """
+        Runs the pipeline on a region of the source image.  The output contours
+        are translated back to the coordinates of the full image.  Contours cut
+        off by the edge of the region (but not by the edge of the image) are
+        parts of larger blobs and are dropped.
+        Returns:
+            The number of contours dropped.
+        """
+
+        region = source[y:y + height, x:x + width]
+        self.process(region)
+
+        features = self.filter_contours_features
+        if (x != 0 or y != 0):
+            features.translate(x, y)
+
+        (region_height, region_width) = region.shape[:2]
+        (source_height, source_width) = source.shape[:2]
+        margin = self.edge_margin()
+        keep = [i for i in range(len(features))
+                if (not PyramidDetector.touchesEdge(features.x[i], features.y[i], features.width[i], features.height[i],
+                                                    x, y, region_width, region_height, source_width, source_height,
+                                                    margin))]
+
+        if (len(keep) < len(features)):
+            self.filter_contours_features = features.select(keep)
+            self.filter_contours_output = self.filter_contours_features.contours
+
+        return len(features) - len(keep)
+
+
+    def edge_margin(self):
+        """
+        Pixels the erode step removes from a blob at the edge of the image
+        (the border counts as background).
+        """
+
+        radius = 1
+        if (self.cv_erode_kernel is not None):
+            radius = max(self.cv_erode_kernel.shape[:2]) // 2
+
+        return int(self.cv_erode_iterations) * radius
+
+
+    def process_scaled(self, source, scale):
+        """
+        Runs the pipeline on a downscaled copy of the source image.  Contours are
+        scaled back up before filtering, so the filter limits and the outputs
+        stay in the coordinates of the full image.
+        """
+
+        if (self.frame_cache is not None):
+            small = self.frame_cache.scaled(source, scale)
+        else:
+            (height, width) = source.shape[:2]
+            size = (max(width // scale, 1), max(height // scale, 1))
+            small = self.buffer_pool.get("scaled", (size[1], size[0], 3))
+            cv2.resize(source, size, dst=small, interpolation=cv2.INTER_LINEAR)
+
+        self.detection_scale = scale
+        try:
+            contours = self.process_detection(small)
+        finally:
+            self.detection_scale = 1
+
+        for contour in contours:
+            contour *= scale
+
+        self.process_filter(contours)
+
+
+    def threshold(self, source, hue, sat, val, dst, hsv_buffer="hsv"):
+        """
+        Runs the HSV threshold step with the HSV conversion shared through the
+        frame cache, or with a pooled HSV conversion.
+        Args:
+            hsv_buffer: Name of the pooled buffer for the HSV conversion.
+        Returns:
+            A black and white numpy.ndarray.
+        """
+
+        if (self.frame_cache is not None):
+            return self.frame_cache.threshold(source, hue, sat, val, dst)
+
+        hsv = self.buffer_pool.get(hsv_buffer, source.shape[:2] + (3,))
+        return self.hsv_threshold(source, hue, sat, val, hsv, dst)
 
 
     @staticmethod
-    def hsv_threshold(input, hue, sat, val):
+    def hsv_threshold(input, hue, sat, val, hsv=None, dst=None):
         """
         Segment an image based on hue, saturation, and value ranges.
         Args:
@@ -103,16 +344,18 @@ class Pipeline:
             hue: A list of two numbers the are the min and max hue.
             sat: A list of two numbers the are the min and max saturation.
             lum: A list of two numbers the are the min and max value.
+            hsv: Optional numpy.ndarray to hold the HSV conversion.
+            dst: Optional numpy.ndarray to hold the output.
         Returns:
             A black and white numpy.ndarray.
         """
 
-        out = cv2.cvtColor(input, cv2.COLOR_BGR2HSV)
-        return cv2.inRange(out, (hue[0], sat[0], val[0]),  (hue[1], sat[1], val[1]))
+        out = cv2.cvtColor(input, cv2.COLOR_BGR2HSV, dst=hsv)
+        return cv2.inRange(out, (hue[0], sat[0], val[0]),  (hue[1], sat[1], val[1]), dst=dst)
 
 
     @staticmethod
-    def cv_erode(src, kernel, anchor, iterations, border_type, border_value):
+    def cv_erode(src, kernel, anchor, iterations, border_type, border_value, dst=None):
         """
         Expands area of lower value in an image.
         Args:
@@ -121,26 +364,51 @@ class Pipeline:
            iterations: the number of times to erode.
            border_type: Opencv enum that represents a border type.
            border_value: value to be used for a constant border.
+           dst: Optional numpy.ndarray to hold the output.
         Returns:
             A numpy.ndarray after erosion.
         """
 
-        return cv2.erode(src, kernel, anchor, iterations = (int) (iterations +0.5),
+        return cv2.erode(src, kernel, dst=dst, anchor=anchor, iterations = (int) (iterations +0.5),
+                            borderType = border_type, borderValue = border_value)
+
+
+    @staticmethod
+    def cv_dilate(src, kernel, anchor, iterations, border_type, border_value, dst=None):
+        """
+        Expands area of higher value in an image.
+        Args:
+           src: A numpy.ndarray.
+           kernel: The kernel for dilation. A numpy.ndarray.
+           iterations: the number of times to dilate.
+           border_type: Opencv enum that represents a border type.
+           border_value: value to be used for a constant border.
+           dst: Optional numpy.ndarray to hold the output.
+        Returns:
+            A numpy.ndarray after dilation.
+        """
+
+        return cv2.dilate(src, kernel, dst=dst, anchor=anchor, iterations = (int) (iterations +0.5),
                             borderType = border_type, borderValue = border_value)
 
 
     @staticmethod
-    def mask(input, mask):
+    def mask(input, mask, dst=None):
         """
         Filter out an area of an image using a binary mask.
         Args:
             input: A three channel numpy.ndarray.
             mask: A black and white numpy.ndarray.
+            dst: Optional numpy.ndarray to hold the output.
         Returns:
             A three channel numpy.ndarray.
         """
 
-        return cv2.bitwise_and(input, input, mask=mask)
+        # Masked-out pixels are left untouched in dst, so clear it first
+        if (dst is not None):
+            dst.fill(0)
+
+        return cv2.bitwise_and(input, input, dst=dst, mask=mask)
 
 
     @staticmethod
@@ -163,10 +431,32 @@ class Pipeline:
         return contours
 
 
+    def find_component_contours(self, input, external_only):
+        """
+        Finds contours using the connected-components backend.  Only blobs that
+        can pass the filter_contours size limits are traced.
+        Args:
+            input: A numpy.ndarray.
+            external_only: A boolean. If true only external contours are found.
+        Return:
+            A list of numpy.ndarray where each one represents a contour.
+        """
+
+        # Contours found on a downscaled image are scaled up before filtering;
+        # limit the blob sizes so the scaled contours can still pass
+        scale = self.detection_scale
+        return ComponentDetector.find_contours(input, external_only,
+                                               (self.filter_contours_min_width - 1) / scale + 1,
+                                               (self.filter_contours_max_width - 1) / scale + 1,
+                                               (self.filter_contours_min_height - 1) / scale + 1,
+                                               (self.filter_contours_max_height - 1) / scale + 1,
+                                               self.filter_contours_min_area / (scale * scale))
+
+
     @staticmethod
     def filter_contours(input_contours, min_area, min_perimeter, min_width, max_width,
                         min_height, max_height, solidity, max_vertex_count, min_vertex_count,
-                        min_ratio, max_ratio):
+                        min_ratio, max_ratio, features=None):
         """
         Filters out contours that do not meet certain criteria.
         Args:
@@ -182,6 +472,8 @@ class Pipeline:
             max_vertex_count: Maximum vertex Count.
             min_ratio: Minimum ratio of width to height.
             max_ratio: Maximum ratio of width to height.
+            features: Optional list that gets a (x, y, width, height, area, hull, hull_area)
+                row for every contour kept (see ContourFeatures).
         Returns:
             Contours as a list of numpy.ndarray.
         """
@@ -199,7 +491,8 @@ class Pipeline:
             if (cv2.arcLength(contour, True) < min_perimeter):
                 continue
             hull = cv2.convexHull(contour)
-            solid = 100 * area / cv2.contourArea(hull)
+            hull_area = cv2.contourArea(hull)
+            solid = 100 * area / hull_area
             if (solid < solidity[0] or solid > solidity[1]):
                 continue
             if (len(contour) < min_vertex_count or len(contour) > max_vertex_count):
@@ -208,4 +501,25 @@ class Pipeline:
             if (ratio < min_ratio or ratio > max_ratio):
                 continue
             output.append(contour)
+            if (features is not None):
+                features.append((x, y, w, h, area, hull, hull_area))
         return output
+
+
+    @staticmethod
+    def filter_contours_vectorized(input_contours, *args, features=None):
+        """
+        Filters contours with ContourFilter, falling back to filter_contours when
+        there are too few contours for vectorizing to pay off.
+        Args:
+            input_contours: Contours as a list of numpy.ndarray.
+            args: The remaining filter_contours arguments.
+            features: Optional list of feature rows (see filter_contours).
+        Returns:
+            Contours as a list of numpy.ndarray.
+        """
+
+        if (len(input_contours) < ContourFilter.MIN_CONTOURS):
+            return Pipeline.filter_contours(input_contours, *args, features=features)
+
+        return ContourFilter.filter(input_contours, *args, features=features)
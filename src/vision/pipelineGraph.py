@@ -0,0 +1,382 @@
+#!/usr/bin/env python3
+
+"""
+----------------------------------------------------------------------------
+Authors:     FRC Team 4145
+
+Description: Declarative pipeline description (a GRIP-style step graph loaded
+             from JSON) and an optimizer that compiles it into a list of
+             steps for the Pipeline to run.  The optimizer removes masks that
+             cannot change their input, fuses chains of erode/dilate steps,
+             removes steps whose output is never used and shares buffers
+             between steps whose outputs are not needed at the same time.
+----------------------------------------------------------------------------
+"""
+
+import json
+import cv2
+import numpy
+
+
+# Inputs and parameters of every supported step type.  Parameter values are
+# stored on the Pipeline as <step name>_<parameter> (e.g. hsv_threshold_hue).
+OPERATIONS = {
+    "hsv_threshold": (["input"], ["hue", "saturation", "value"]),
+    "cv_erode": (["src"], ["kernel", "anchor", "iterations", "bordertype", "bordervalue"]),
+    "cv_dilate": (["src"], ["kernel", "anchor", "iterations", "bordertype", "bordervalue"]),
+    "mask": (["input", "mask"], []),
+    "find_contours": (["input"], ["external_only"]),
+    "filter_contours": (["contours"], ["min_area", "min_perimeter", "min_width", "max_width", "min_height",
+                                       "max_height", "solidity", "max_vertices", "min_vertices", "min_ratio",
+                                       "max_ratio"]),
+}
+
+MORPHOLOGY = ("cv_erode", "cv_dilate")
+
+
+class GraphStep:
+
+    def __init__(self, name, op, inputs, params):
+        # Step name (also the name of its output)
+        self.name = name
+        self.op = op
+        # Names of the input values, in the order of OPERATIONS
+        self.inputs = inputs
+        # Parameter values, in the order of OPERATIONS
+        self.params = params
+        # Name shown in stage listings and timing (fused steps join their names)
+        self.label = name
+
+    def param(self, name):
+        """
+        Get a parameter value by name.
+        """
+
+        return self.params[OPERATIONS[self.op][1].index(name)]
+
+    def copy(self):
+        """
+        Copy the step so the optimizer can change it.
+        """
+
+        step = GraphStep(self.name, self.op, list(self.inputs), list(self.params))
+        step.label = self.label
+        return step
+
+
+class PipelineGraph:
+
+    def __init__(self, description):
+        """
+        Create a graph from a description (see pipeline.json).
+        """
+
+        self.source = description.get("source", "source")
+        self.output = description["output"]
+        self.description = description
+
+        self.steps = []
+        names = set([self.source])
+        for step in description["steps"]:
+            (name, op) = (step["name"], step["op"])
+            if (op not in OPERATIONS):
+                raise ValueError("Unknown pipeline step type '{}' ({})".format(op, name))
+            if (name in names):
+                raise ValueError("Duplicate pipeline step name '{}'".format(name))
+
+            inputs = []
+            for input in OPERATIONS[op][0]:
+                value = step["inputs"][input]
+                if (value not in names):
+                    raise ValueError("Pipeline step '{}' uses '{}' before it is defined".format(name, value))
+                inputs.append(value)
+
+            # Parameters are stored on the Pipeline by step name, so every value must be given
+            params = step.get("params", {})
+            missing = [param for param in OPERATIONS[op][1] if (param not in params)]
+            if (missing):
+                raise ValueError("Pipeline step '{}' is missing parameters: {}".format(name, ", ".join(missing)))
+            unknown = [param for param in params if (param not in OPERATIONS[op][1])]
+            if (unknown):
+                raise ValueError("Unknown parameters for pipeline step '{}': {}".format(name, ", ".join(unknown)))
+
+            names.add(name)
+            self.steps.append(GraphStep(name, op, inputs, []))
+
+        # The pipeline filters with its filter_contours_* parameters
+        if (self.output != "filter_contours" or self.findStep(self.output) is None or
+                self.findStep(self.output).op != "filter_contours"):
+            raise ValueError("Pipeline output must be a filter_contours step named 'filter_contours'")
+
+    @staticmethod
+    def load(path):
+        """
+        Load a graph from a JSON file.
+        """
+
+        with open(path, "r") as file:
+            return PipelineGraph(json.load(file))
+
+    def findStep(self, name):
+        """
+        Find a step by name.
+        """
+
+        for step in self.steps:
+            if (step.name == name):
+                return step
+
+        return None
+
+    def applyParams(self, pipeline):
+        """
+        Set the parameter values from the description on the pipeline.
+        """
+
+        for step in self.description["steps"]:
+            for (param, value) in step.get("params", {}).items():
+                if (param == "bordertype" and isinstance(value, str)):
+                    value = getattr(cv2, value)
+                elif (param == "kernel" and value is not None):
+                    value = numpy.array(value, dtype=numpy.uint8)
+                elif (param == "anchor"):
+                    value = tuple(value)
+
+                setattr(pipeline, "{}_{}".format(step["name"], param), value)
+
+    def compile(self, pipeline, optimize=True):
+        """
+        Compile the image steps of the graph using the current pipeline
+        parameters.  The filter_contours output step is run by the pipeline.
+        :return: A GraphProgram that returns the contours to filter
+        """
+
+        steps = []
+        for step in self.steps:
+            step = step.copy()
+            step.params = [getattr(pipeline, "{}_{}".format(step.name, param)) for param in OPERATIONS[step.op][1]]
+            steps.append(step)
+
+        if (optimize):
+            steps = self.removeRedundantMasks(steps)
+            steps = self.fuseMorphology(steps)
+
+        # The output step is run by the pipeline; its input is the program output
+        output = [step for step in steps if (step.name == self.output)][0]
+        steps = self.removeDeadSteps(steps, output.inputs[0])
+
+        return GraphProgram(pipeline, steps, self.source, output.inputs[0])
+
+    @staticmethod
+    def anchorInKernel(kernel, anchor):
+        """
+        Check if the anchor pixel is part of the kernel.  Erosion can then
+        only remove pixels.
+        """
+
+        if (kernel is None):
+            return True
+
+        (rows, cols) = kernel.shape[:2]
+        x = anchor[0] if (anchor[0] >= 0) else cols // 2
+        y = anchor[1] if (anchor[1] >= 0) else rows // 2
+        return kernel[y, x] != 0
+
+    @staticmethod
+    def removeRedundantMasks(steps):
+        """
+        Remove mask steps whose input is already inside the mask (e.g. the
+        eroded threshold masked by the threshold itself).  Users of the mask
+        output use its input instead.
+        """
+
+        producers = {}
+        aliases = {}
+
+        def isSubset(value, mask):
+            # Non-zero pixels of value are all non-zero in mask
+            if (value == mask):
+                return True
+
+            step = producers.get(value)
+            if (step is None):
+                return False
+            if (step.op == "cv_erode" and PipelineGraph.anchorInKernel(step.param("kernel"), step.param("anchor"))):
+                return isSubset(step.inputs[0], mask)
+            if (step.op == "mask"):
+                return isSubset(step.inputs[0], mask) or isSubset(step.inputs[1], mask)
+
+            return False
+
+        output = []
+        for step in steps:
+            step.inputs = [aliases.get(value, value) for value in step.inputs]
+
+            if (step.op == "mask" and isSubset(step.inputs[0], step.inputs[1])):
+                aliases[step.name] = step.inputs[0]
+                continue
+
+            producers[step.name] = step
+            output.append(step)
+
+        return output
+
+    @staticmethod
+    def fuseMorphology(steps):
+        """
+        Fuse an erode (or dilate) step with the step that erodes its output
+        again with the same kernel into one step with the iterations added.
+        """
+
+        uses = {}
+        for step in steps:
+            for value in step.inputs:
+                uses[value] = uses.get(value, 0) + 1
+
+        output = []
+        for step in steps:
+            previous = output[-1] if (output) else None
+            if (previous is not None and step.op in MORPHOLOGY and previous.op == step.op and
+                    step.inputs[0] == previous.name and uses[previous.name] == 1 and
+                    PipelineGraph.sameMorphology(previous, step)):
+                fused = step.copy()
+                fused.inputs = list(previous.inputs)
+                fused.params[OPERATIONS[step.op][1].index("iterations")] = (
+                    int(previous.param("iterations") + 0.5) + int(step.param("iterations") + 0.5))
+                fused.label = "{}+{}".format(previous.label, step.label)
+                output[-1] = fused
+                continue
+
+            output.append(step)
+
+        return output
+
+    @staticmethod
+    def sameMorphology(first, second):
+        """
+        Check if two erode/dilate steps use the same kernel, anchor and border.
+        """
+
+        (first_kernel, second_kernel) = (first.param("kernel"), second.param("kernel"))
+        if ((first_kernel is None) != (second_kernel is None)):
+            return False
+        if (first_kernel is not None and not numpy.array_equal(first_kernel, second_kernel)):
+            return False
+
+        return (tuple(first.param("anchor")) == tuple(second.param("anchor")) and
+                first.param("bordertype") == second.param("bordertype") and
+                first.param("bordervalue") == second.param("bordervalue"))
+
+    @staticmethod
+    def removeDeadSteps(steps, output):
+        """
+        Remove steps that the output does not depend on.
+        """
+
+        live = set([output])
+        kept = []
+        for step in reversed(steps):
+            if (step.name in live):
+                live.update(step.inputs)
+                kept.append(step)
+
+        kept.reverse()
+        return kept
+
+
+class GraphProgram:
+
+    def __init__(self, pipeline, steps, source, output):
+        self.pipeline = pipeline
+        self.steps = steps
+        self.source = source
+        self.output = output
+
+        # Assign pooled buffers to image outputs.  A buffer is reused once the
+        # last step reading its value has run.
+        channels = {source: 3}
+        last_use = {}
+        for (index, step) in enumerate(steps):
+            for value in step.inputs:
+                last_use[value] = index
+
+        self.buffers = {}
+        free = {}
+        buffer_count = 0
+        for (index, step) in enumerate(steps):
+            if (step.op == "hsv_threshold"):
+                channels[step.name] = 1
+            elif (step.op in MORPHOLOGY or step.op == "mask"):
+                channels[step.name] = channels[step.inputs[0]]
+
+            if (step.name in channels):
+                available = free.setdefault(channels[step.name], [])
+                if (available):
+                    buffer = available.pop()
+                else:
+                    buffer = "graph_{}".format(buffer_count)
+                    buffer_count += 1
+                self.buffers[step.name] = (buffer, channels[step.name])
+
+            for value in set(step.inputs):
+                if (last_use[value] == index and value in self.buffers):
+                    (buffer, channel_count) = self.buffers[value]
+                    free.setdefault(channel_count, []).append(buffer)
+
+        self.buffer_count = buffer_count
+
+    def run(self, source, timer=None):
+        """
+        Run the steps on a source image.
+        :return: The output value (unfiltered contours)
+        """
+
+        pipeline = self.pipeline
+        buffer_pool = pipeline.buffer_pool
+        (height, width) = source.shape[:2]
+        values = {self.source: source}
+
+        if (timer is not None):
+            start = timer.now()
+
+        for step in self.steps:
+            inputs = [values[value] for value in step.inputs]
+            params = step.params
+
+            dst = None
+            if (step.name in self.buffers):
+                (buffer, channel_count) = self.buffers[step.name]
+                shape = (height, width) if (channel_count == 1) else (height, width, channel_count)
+                dst = buffer_pool.get(buffer, shape)
+
+            if (step.op == "hsv_threshold"):
+                pipeline.threshold(inputs[0], params[0], params[1], params[2], dst, "graph_hsv")
+            elif (step.op == "cv_erode"):
+                pipeline.cv_erode(inputs[0], *params, dst=dst)
+            elif (step.op == "cv_dilate"):
+                pipeline.cv_dilate(inputs[0], *params, dst=dst)
+            elif (step.op == "mask"):
+                pipeline.mask(inputs[0], inputs[1], dst)
+            elif (step.op == "find_contours"):
+                dst = pipeline.find_contours(inputs[0], params[0])
+            values[step.name] = dst
+
+            if (timer is not None):
+                start = timer.record(step.label, start)
+
+        return values[self.output]
+
+    def describe(self):
+        """
+        List the steps of the program.
+        :return: A list of (label, description) strings
+        """
+
+        listing = []
+        for step in self.steps:
+            buffer = ""
+            if (step.name in self.buffers):
+                buffer = " [{}]".format(self.buffers[step.name][0])
+            listing.append((step.label, "{}({}){}".format(step.op, ", ".join(step.inputs), buffer)))
+
+        return listing
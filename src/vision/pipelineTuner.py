@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+
+"""
+----------------------------------------------------------------------------
+Authors:     FRC Team 4145
+
+Description: Live tuning of the pipeline parameters over NetworkTables.  Each
+             parameter is an entry of the 'vision/tuning' table.  Changes are
+             received by a NetworkTables listener and applied between frames,
+             then the pipeline only rebuilds the state derived from the
+             parameters that changed.
+----------------------------------------------------------------------------
+"""
+
+import threading
+
+
+# Tuning sub table of the 'vision' table
+TUNING_TABLE = "tuning"
+
+# Parameter types
+RANGE = "range"
+NUMBER = "number"
+BOOLEAN = "boolean"
+
+# Pipeline attributes that can be tuned
+TUNABLE_PARAMETERS = {
+    "hsv_threshold_hue": RANGE,
+    "hsv_threshold_saturation": RANGE,
+    "hsv_threshold_value": RANGE,
+    "cv_erode_iterations": NUMBER,
+    "find_contours_external_only": BOOLEAN,
+    "filter_contours_min_area": NUMBER,
+    "filter_contours_min_perimeter": NUMBER,
+    "filter_contours_min_width": NUMBER,
+    "filter_contours_max_width": NUMBER,
+    "filter_contours_min_height": NUMBER,
+    "filter_contours_max_height": NUMBER,
+    "filter_contours_solidity": RANGE,
+    "filter_contours_max_vertices": NUMBER,
+    "filter_contours_min_vertices": NUMBER,
+    "filter_contours_min_ratio": NUMBER,
+    "filter_contours_max_ratio": NUMBER,
+}
+
+
+class PipelineTuner:
+
+    def __init__(self, logger, connection, pipeline):
+        self.logger = logger
+        self.connection = connection
+        self.pipeline = pipeline
+
+        # Values received by the listener thread, applied by the processing thread
+        self.lock = threading.Lock()
+        self.pending = {}
+
+        self.table = None
+
+    def start(self):
+        """
+        Publish the current parameter values and listen for changes.
+        :return: True if tuning is available (NetworkTables is installed)
+        """
+
+        table = self.connection.getTable()
+        if (table is None):
+            return False
+
+        self.table = table.getSubTable(TUNING_TABLE)
+
+        # Values already on the server (tuned before a restart) are kept and applied
+        for name in TUNABLE_PARAMETERS:
+            self.table.getEntry(name).setDefaultValue(self.getValue(name))
+
+        self.table.addEntryListener(self.valueChanged, immediateNotify=True)
+        self.logger.logMessage("Pipeline parameters can be tuned in the '{}' table".format(TUNING_TABLE))
+
+        return True
+
+    def getValue(self, name):
+        """
+        Current value of a parameter in NetworkTables form.
+        """
+
+        value = getattr(self.pipeline, name)
+        if (TUNABLE_PARAMETERS[name] == RANGE):
+            return [float(value[0]), float(value[1])]
+
+        if (TUNABLE_PARAMETERS[name] == BOOLEAN):
+            return bool(value)
+
+        return float(value)
+
+    def valueChanged(self, table, key, value, is_new):
+        """
+        NetworkTables listener (called on the NetworkTables thread).
+        """
+
+        if (key in TUNABLE_PARAMETERS):
+            with self.lock:
+                self.pending[key] = value
+
+    def applyPending(self):
+        """
+        Apply the values received since the last frame.
+        :return: The names of the parameters that changed
+        """
+
+        if (not self.pending):
+            return []
+
+        with self.lock:
+            (pending, self.pending) = (self.pending, {})
+
+        changed = []
+        for (name, value) in pending.items():
+            value = self.convertValue(name, value)
+            if (value is None):
+                # Put the value in use back so the dashboard shows it
+                self.logger.logMessage("Invalid value for {}: {}".format(name, pending[name]))
+                self.table.getEntry(name).setValue(self.getValue(name))
+                continue
+
+            if (value != getattr(self.pipeline, name)):
+                setattr(self.pipeline, name, value)
+                changed.append(name)
+
+        if (changed):
+            self.pipeline.invalidate(changed)
+            self.logger.logMessage("Tuned " + ", ".join("{} = {}".format(name, getattr(self.pipeline, name)) for name in changed))
+
+        return changed
+
+    @staticmethod
+    def convertValue(name, value):
+        """
+        Convert a NetworkTables value to the pipeline attribute type.
+        :return: The value, or None if it is not valid
+        """
+
+        kind = TUNABLE_PARAMETERS[name]
+        try:
+            if (kind == RANGE):
+                (low, high) = [float(item) for item in value]
+                return [low, high] if (low <= high) else None
+
+            if (kind == BOOLEAN):
+                return value if (isinstance(value, bool)) else None
+
+            if (isinstance(value, bool)):
+                return None
+            value = float(value)
+            return value if (value >= 0) else None
+
+        except (TypeError, ValueError):
+            return None
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+
+"""
+----------------------------------------------------------------------------
+Authors:     FRC Team 4145
+
+Description: Coarse-to-fine detection.  Blobs are found on a downscaled copy
+             of the frame and only the regions around candidate blobs are
+             processed by the pipeline at full resolution, so centroids and
+             boxes keep full-resolution precision.
+----------------------------------------------------------------------------
+"""
+
+import cv2
+import numpy
+from .bufferPool import BufferPool
+from .constants import Constants
+from .contourFeatures import ContourFeatures
+
+
+class PyramidDetector:
+
+    def __init__(self, logger, scale):
+        self.logger = logger
+        # Downscale factor of the coarse image
+        self.scale = scale
+        self.buffer_pool = BufferPool()
+
+        # Fraction of the frame processed at full resolution
+        self.touched_fraction = 0.0
+        self.touched_total = 0.0
+        self.frame_count = 0
+
+    def process(self, source, pipeline):
+        """
+        Run the coarse search and refine the candidates with the pipeline.
+        Sets pipeline.filter_contours_output in full-frame coordinates.
+        """
+
+        (height, width) = source.shape[:2]
+        regions = self.findRegions(source, pipeline)
+
+        tables = []
+        touched = 0
+        for (x, y, w, h) in regions:
+            # Contours cut off by the region are dropped (parts of larger blobs)
+            pipeline.process_region(source, x, y, w, h)
+            touched += w * h
+
+            tables.append(pipeline.filter_contours_features)
+
+        features = ContourFeatures.concatenate(tables)
+        pipeline.filter_contours_features = features
+        pipeline.filter_contours_output = features.contours
+
+        self.recordFrame(touched / float(width * height))
+
+    def findRegions(self, source, pipeline):
+        """
+        Find the full-resolution regions around blobs of the coarse image that
+        could pass the contour size filters.
+        """
+
+        (height, width) = source.shape[:2]
+        scale = self.scale
+        coarse_size = (max(width // scale, 1), max(height // scale, 1))
+
+        threshold = self.buffer_pool.get("threshold", (coarse_size[1], coarse_size[0]))
+        mask = self.buffer_pool.get("mask", (coarse_size[1], coarse_size[0]))
+
+        # The coarse image and its HSV conversion are shared with other target types
+        cache = pipeline.frame_cache
+        if (cache is not None):
+            cache.threshold(cache.scaled(source, scale), pipeline.hsv_threshold_hue, pipeline.hsv_threshold_saturation,
+                            pipeline.hsv_threshold_value, threshold)
+        else:
+            small = self.buffer_pool.get("small", (coarse_size[1], coarse_size[0], 3))
+            hsv = self.buffer_pool.get("hsv", (coarse_size[1], coarse_size[0], 3))
+            cv2.resize(source, coarse_size, dst=small, interpolation=cv2.INTER_LINEAR)
+            pipeline.hsv_threshold(small, pipeline.hsv_threshold_hue, pipeline.hsv_threshold_saturation,
+                                   pipeline.hsv_threshold_value, hsv, threshold)
+        # A target that passes the size filters after the full-resolution
+        # erode covers at least this many whole coarse pixels
+        edge = pipeline.edge_margin()
+        cells_x = max(int(pipeline.filter_contours_min_width + 2 * edge - scale + 1) // scale, 1)
+        cells_y = max(int(pipeline.filter_contours_min_height + 2 * edge - scale + 1) // scale, 1)
+
+        # Remove noise with a kernel that fits inside the smallest target, so
+        # the erode cannot remove a target that is only a few coarse pixels wide
+        kernel_size = (min(cells_x, 3), min(cells_y, 3))
+        if (kernel_size != (1, 1)):
+            kernel = numpy.ones((kernel_size[1], kernel_size[0]), numpy.uint8)
+            pipeline.cv_erode(threshold, kernel, (-1, -1), 1, pipeline.cv_erode_bordertype,
+                              pipeline.cv_erode_bordervalue, mask)
+        else:
+            mask = threshold
+        min_width = cells_x - kernel_size[0] + 1
+        min_height = cells_y - kernel_size[1] + 1
+        (contours, hierarchy) = cv2.findContours(mask, mode=cv2.RETR_EXTERNAL, method=cv2.CHAIN_APPROX_SIMPLE)
+
+        # Allow for blobs growing or shrinking by a coarse pixel on each side
+        slack = 2 * scale
+        margin = Constants.PYRAMID_MARGIN + scale
+
+        regions = []
+        for contour in contours:
+            (x, y, w, h) = cv2.boundingRect(contour)
+            if (w < min_width or h < min_height):
+                continue
+            (x, y, w, h) = (x * scale, y * scale, w * scale, h * scale)
+
+            # Holes inside larger blobs are contours too unless only external contours are found
+            if (pipeline.find_contours_external_only and
+                    (w - slack > pipeline.filter_contours_max_width or h - slack > pipeline.filter_contours_max_height)):
+                continue
+
+            left = max(x - margin, 0)
+            top = max(y - margin, 0)
+            right = min(x + w + margin, width)
+            bottom = min(y + h + margin, height)
+            regions.append([left, top, right, bottom])
+
+        return [(left, top, right - left, bottom - top) for (left, top, right, bottom) in self.mergeRegions(regions)]
+
+    @staticmethod
+    def mergeRegions(regions):
+        """
+        Merge overlapping regions so no pixel is processed twice.
+        """
+
+        merged = True
+        while (merged):
+            merged = False
+            output = []
+            for region in regions:
+                for other in output:
+                    if (region[0] < other[2] and other[0] < region[2] and region[1] < other[3] and other[1] < region[3]):
+                        other[0] = min(other[0], region[0])
+                        other[1] = min(other[1], region[1])
+                        other[2] = max(other[2], region[2])
+                        other[3] = max(other[3], region[3])
+                        merged = True
+                        break
+                else:
+                    output.append(region)
+            regions = output
+
+        return regions
+
+    @staticmethod
+    def touchesEdge(cx, cy, cw, ch, x, y, w, h, width, height, margin=0):
+        """
+        Check if a contour (by its bounding box) was cut off by the edge of its
+        region (but not by the edge of the frame).  These are parts of larger
+        blobs.
+        :param margin: Pixels between a cut off blob and the edge (eroded away)
+        """
+
+        return ((cx <= x + margin and x > 0) or (cy <= y + margin and y > 0) or
+                (cx + cw >= x + w - margin and x + w < width) or (cy + ch >= y + h - margin and y + h < height))
+
+    def recordFrame(self, touched_fraction):
+        """
+        Record the full-resolution area touched and periodically report it.
+        """
+
+        self.touched_fraction = touched_fraction
+        self.touched_total += touched_fraction
+        self.frame_count += 1
+
+        if (self.frame_count >= Constants.PYRAMID_REPORT_INTERVAL):
+            self.logger.logMessage("Pyramid detection: {:.1f}% of full-resolution area processed".format(
+                100.0 * self.touched_total / self.frame_count))
+            self.touched_total = 0.0
+            self.frame_count = 0
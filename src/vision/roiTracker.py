@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+
+"""
+----------------------------------------------------------------------------
+Authors:     FRC Team 4145
+
+Description: Region-of-interest tracking.  Predicts a padded search window
+             around the targets found in the previous frame so the pipeline
+             only has to process that part of the image.
+----------------------------------------------------------------------------
+"""
+
+import numpy
+from .constants import Constants
+
+
+# Frame processing modes
+MODE_FULL = "full"
+MODE_ROI = "roi"
+MODE_ROI_MISS = "roi_miss"
+
+
+class RoiTracker:
+
+    def __init__(self, logger):
+        self.logger = logger
+
+        # Frames processed since the last full-frame search
+        self.frames_since_full = 0
+
+        # Frame count and total process time for each mode
+        self.frame_counts = {MODE_FULL: 0, MODE_ROI: 0, MODE_ROI_MISS: 0}
+        self.frame_times = {MODE_FULL: 0.0, MODE_ROI: 0.0, MODE_ROI_MISS: 0.0}
+        self.frames_since_report = 0
+
+    def selectWindow(self, contour_data, width, height):
+        """
+        Select the search window for the next frame.
+        :param contour_data: The ContourData found in the previous frame
+        :return: Tuple of (x, y, width, height) or None to search the full frame
+        """
+
+        if (len(contour_data) == 0 or self.frames_since_full >= Constants.ROI_FULL_FRAME_INTERVAL):
+            return None
+
+        return self.predictWindow(contour_data, width, height)
+
+    def predictWindow(self, contour_data, width, height):
+        """
+        Calculate a padded window containing the boxes of every contour.
+        """
+
+        points = numpy.concatenate([contour.box[0] for contour in contour_data])
+        (min_x, min_y) = points.min(axis=0)
+        (max_x, max_y) = points.max(axis=0)
+
+        # Pad by a fixed amount plus a fraction of the target size to allow for motion
+        pad_x = Constants.ROI_PADDING + Constants.ROI_PADDING_SCALE * (max_x - min_x)
+        pad_y = Constants.ROI_PADDING + Constants.ROI_PADDING_SCALE * (max_y - min_y)
+
+        left = max(int(min_x - pad_x), 0)
+        top = max(int(min_y - pad_y), 0)
+        right = min(int(max_x + pad_x) + 1, width)
+        bottom = min(int(max_y + pad_y) + 1, height)
+
+        if (right <= left or bottom <= top):
+            return None
+
+        return (left, top, right - left, bottom - top)
+
+    def recordFrame(self, mode, process_time):
+        """
+        Record the mode and process time of a frame and periodically report the
+        ROI hit rate.
+        """
+
+        if (mode == MODE_ROI):
+            self.frames_since_full += 1
+        else:
+            self.frames_since_full = 0
+
+        self.frame_counts[mode] += 1
+        self.frame_times[mode] += process_time
+        self.frames_since_report += 1
+
+        if (self.frames_since_report >= Constants.ROI_REPORT_INTERVAL):
+            self.logger.logMessage(self.report())
+            self.frames_since_report = 0
+
+    def report(self):
+        """
+        Summarize the ROI hit rate and the average process time of each mode.
+        """
+
+        total = sum(self.frame_counts.values())
+        attempts = self.frame_counts[MODE_ROI] + self.frame_counts[MODE_ROI_MISS]
+
+        hit_rate = 0.0
+        if (attempts > 0):
+            hit_rate = 100.0 * self.frame_counts[MODE_ROI] / attempts
+
+        average_times = []
+        for mode in (MODE_FULL, MODE_ROI, MODE_ROI_MISS):
+            count = self.frame_counts[mode]
+            average = 0.0
+            if (count > 0):
+                average = 1000.0 * self.frame_times[mode] / count
+            average_times.append("{}: {} frames, {:.2f} ms".format(mode, count, average))
+
+        return "ROI tracking: {} frames, hit rate {:.1f}% ({})".format(total, hit_rate, ", ".join(average_times))
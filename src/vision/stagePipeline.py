@@ -0,0 +1,543 @@
+#!/usr/bin/env python3
+
+"""
+----------------------------------------------------------------------------
+Authors:     FRC Team 4145
+
+Description: Stage-pipelined vision processing.  Capture, detection,
+             filtering/publishing and output each run in their own process,
+             connected by bounded queues.  Frames stay in shared memory and
+             only slot numbers and small results travel through the queues.
+----------------------------------------------------------------------------
+"""
+
+import multiprocessing
+import queue
+import time
+import numpy
+from .cameraHost import CameraHost
+from .connection import Connection
+from .constants import Constants
+from .dashboardStream import DashboardStream
+from .logger import Logger
+from .pipeline import Pipeline
+from .visionProcessor import VisionProcessor
+
+
+# Stage names, in pipeline order
+STAGE_CAPTURE = "capture"
+STAGE_DETECT = "detect"
+STAGE_PUBLISH = "publish"
+STAGE_OUTPUT = "output"
+STAGES = [STAGE_CAPTURE, STAGE_DETECT, STAGE_PUBLISH, STAGE_OUTPUT]
+
+# Seconds to wait on an empty queue before checking again
+QUEUE_TIMEOUT = 0.5
+
+# Attempts to make room in a full queue before the new item is dropped
+PUT_ATTEMPTS = 3
+
+# Owner of a frame slot that is free or waiting in a queue (stages own slots by index)
+SLOT_FREE = -1
+SLOT_QUEUED = -2
+
+# Seconds between checks that every stage is still alive
+STAGE_CHECK_INTERVAL = 1.0
+
+# Seconds to wait for a stage process to stop
+STOP_TIMEOUT = 2.0
+
+
+class FramePool:
+    """
+    Fixed set of frame slots in shared memory.
+    """
+
+    def __init__(self, slot_count, width, height):
+        self.slot_count = slot_count
+        self.shape = (height, width, 3)
+        self.slot_size = width * height * 3
+
+        self.memory = multiprocessing.RawArray('B', slot_count * self.slot_size)
+        self.free_slots = multiprocessing.Queue()
+        for slot in range(slot_count):
+            self.free_slots.put(slot)
+
+        # Stage holding each slot, so the slots of a stage that dies can be released
+        self.owners = multiprocessing.RawArray('i', [SLOT_FREE] * slot_count)
+
+        # Numpy views are created in each process on first use
+        self.views = None
+
+    def view(self, slot):
+        """
+        Get the numpy.ndarray view of a frame slot.
+        """
+
+        if (self.views is None):
+            memory = numpy.frombuffer(self.memory, dtype=numpy.uint8)
+            self.views = [memory[i * self.slot_size:(i + 1) * self.slot_size].reshape(self.shape)
+                          for i in range(self.slot_count)]
+
+        return self.views[slot]
+
+    def acquire(self, owner):
+        """
+        Wait for a free frame slot.
+        :param owner: Index of the stage taking the slot
+        """
+
+        slot = self.free_slots.get()
+        self.owners[slot] = owner
+
+        return slot
+
+    def release(self, slot):
+        """
+        Return a frame slot to the pool.
+        """
+
+        self.owners[slot] = SLOT_FREE
+        self.free_slots.put(slot)
+
+    def setOwner(self, slot, owner):
+        """
+        Record the stage holding a slot (or SLOT_QUEUED).
+        """
+
+        self.owners[slot] = owner
+
+    def releaseOwned(self, owner):
+        """
+        Release the slots held by a stage that exited.  A slot passing
+        between the stage and a queue when it died is lost (the pool has a few
+        spare slots).
+        :return: The number of slots released
+        """
+
+        slots = [slot for slot in range(self.slot_count) if (self.owners[slot] == owner)]
+        for slot in slots:
+            self.release(slot)
+
+        return len(slots)
+
+
+class StageQueue:
+    """
+    Bounded queue of (slot, ...) items that drops the oldest item when full.
+    """
+
+    def __init__(self, depth, frame_pool, dropped):
+        self.queue = multiprocessing.Queue(maxsize=depth)
+        self.frame_pool = frame_pool
+        # Shared counter of dropped items
+        self.dropped = dropped
+
+    def put(self, item):
+        """
+        Add an item, dropping (and releasing the frame of) the oldest item if full.
+        """
+
+        self.frame_pool.setOwner(item[0], SLOT_QUEUED)
+
+        for attempt in range(PUT_ATTEMPTS):
+            try:
+                self.queue.put_nowait(item)
+                return
+            except queue.Full:
+                try:
+                    oldest = self.queue.get_nowait()
+                except queue.Empty:
+                    # The reader is taking an item (or died while holding the queue)
+                    continue
+
+                self.drop(oldest)
+
+        self.drop(item)
+
+    def drop(self, item):
+        """
+        Release the frame of an item that is not processed.
+        """
+
+        self.frame_pool.release(item[0])
+        with self.dropped.get_lock():
+            self.dropped.value += 1
+
+    def get(self):
+        """
+        Get the next item, or None if nothing arrives within QUEUE_TIMEOUT.
+        """
+
+        try:
+            return self.queue.get(timeout=QUEUE_TIMEOUT)
+        except queue.Empty:
+            return None
+
+
+class StageWorker(multiprocessing.Process):
+    """
+    Base class of a pipeline stage running in its own process.
+    """
+
+    def __init__(self, engine, stage_name, input_queue, output_queue):
+        multiprocessing.Process.__init__(self, name="Stage-" + stage_name, daemon=True)
+        self.engine = engine
+        self.stage_name = stage_name
+        self.stage_index = STAGES.index(stage_name)
+        self.input_queue = input_queue
+        self.output_queue = output_queue
+
+    def run(self):
+        """
+        Set up the stage and run it until the process is stopped.
+        """
+
+        self.logger = Logger(self.engine.usb_drive)
+        self.frame_pool = self.engine.frame_pool
+        self.setup()
+
+        try:
+            self.loop()
+        finally:
+            # atexit handlers do not run in worker processes
+            if (self.engine.usb_drive is not None):
+                self.engine.usb_drive.close()
+
+    def loop(self):
+        """
+        Continuously process items and record how busy the stage is.
+        """
+
+        busy_time = 0.0
+        frame_count = 0
+        report_start = time.time()
+
+        while True:
+            item = None
+            if (self.input_queue is not None):
+                item = self.input_queue.get()
+                if (item is None):
+                    continue
+                self.frame_pool.setOwner(item[0], self.stage_index)
+                self.countFrame()
+
+            start = time.time()
+            self.step(item)
+            end = time.time()
+
+            busy_time += end - start
+            frame_count += 1
+
+            elapsed = end - report_start
+            if (elapsed >= Constants.STAGE_REPORT_INTERVAL):
+                self.engine.utilization[self.stage_index] = busy_time / elapsed
+                self.engine.fps[self.stage_index] = frame_count / elapsed
+                busy_time = 0.0
+                frame_count = 0
+                report_start = end
+
+    def countFrame(self):
+        """
+        Count a frame received by the stage (shows the supervisor the stage is working).
+        """
+
+        self.engine.received[self.stage_index] += 1
+
+    def setup(self):
+        """
+        Create the objects used by the stage (runs in the stage process).
+        """
+
+        pass
+
+    def step(self, item):
+        """
+        Process one item from the input queue.
+        """
+
+        raise NotImplementedError
+
+    def forward(self, item):
+        """
+        Pass an item to the next stage, or release its frame if this is the last stage.
+        """
+
+        if (self.output_queue is not None):
+            self.output_queue.put(item)
+        else:
+            self.frame_pool.release(item[0])
+
+
+class CaptureStage(StageWorker):
+    """
+    Grabs camera frames directly into shared frame slots.
+    """
+
+    def setup(self):
+        # Only the camera and its sink, the output stage owns the custom stream
+        self.camera_host = CameraHost(self.logger, [], None)
+        camera = self.camera_host.startVisionCamera(self.engine.config.camera_configs[0])
+        self.cv_sink = self.camera_host.startVisionSink(camera)
+        self.sequence = 0
+
+    def step(self, item):
+        slot = self.frame_pool.acquire(self.stage_index)
+        frame = self.frame_pool.view(slot)
+
+        (frame_time, grabbed) = self.cv_sink.grabFrame(frame)
+        if (frame_time == 0):
+            self.frame_pool.release(slot)
+            return
+        self.countFrame()
+
+        # grabFrame only fills the slot when the size matches
+        if (grabbed is not frame):
+            if (grabbed.shape != frame.shape):
+                self.logger.logMessage("Frame size {} does not match the frame pool".format(grabbed.shape), True)
+                self.frame_pool.release(slot)
+                return
+            numpy.copyto(frame, grabbed)
+
+        self.sequence += 1
+        self.forward((slot, frame_time, self.sequence))
+
+
+class DetectStage(StageWorker):
+    """
+    Runs the image stages of the pipeline (threshold through find contours).
+    """
+
+    def setup(self):
+        self.pipeline = Pipeline()
+
+    def step(self, item):
+        (slot, frame_time, sequence) = item
+
+        contours = self.pipeline.process_detection(self.frame_pool.view(slot))
+
+        self.forward((slot, frame_time, sequence, contours))
+
+
+class PublishStage(StageWorker):
+    """
+    Filters the contours, calculates the contour data and publishes it.
+    """
+
+    def setup(self):
+        config = self.engine.config
+
+        client_address = None
+        if (config.server):
+            client_address = "127.0.0.1"
+
+        self.connection = Connection(self.logger, False, config.team, client_address=client_address, new_instance=True)
+        self.pipeline = Pipeline()
+        self.vision_processor = VisionProcessor(self.logger, self.connection, None)
+
+    def step(self, item):
+        (slot, frame_time, sequence, contours) = item
+
+        contour_data = []
+        self.pipeline.frame_time = frame_time
+        self.pipeline.frame_sequence = sequence
+        try:
+            self.pipeline.process_filter(contours)
+            contour_data = self.vision_processor.calculateContourData(self.pipeline)
+        except (ZeroDivisionError):
+            self.logger.logMessage("Divide by 0 exception in Pipeline")
+
+        self.connection.publishValues(contour_data, frame_time, sequence)
+
+        self.forward((slot, frame_time, sequence, contour_data))
+
+
+class OutputStage(StageWorker):
+    """
+    Draws the overlay, outputs the custom stream and saves images.
+    """
+
+    def setup(self):
+        config = self.engine.config
+        self.camera_host = CameraHost(self.logger, [], None)
+
+        (height, width) = self.frame_pool.shape[:2]
+        (stream_width, stream_height) = DashboardStream.streamSize(width, height)
+        self.camera_host.cv_source = self.camera_host.startOutputSource(stream_width, stream_height,
+                                                                        config.camera_configs[0].name)
+        self.vision_processor = VisionProcessor(self.logger, None, self.camera_host)
+
+    def step(self, item):
+        (slot, frame_time, sequence, contour_data) = item
+
+        frame = self.frame_pool.view(slot)
+        if (Constants.ENABLE_BLACK_BOX):
+            self.vision_processor.recordFrame(frame, frame_time, sequence, contour_data)
+        self.vision_processor.writeFrame(frame, contour_data)
+
+        self.frame_pool.release(slot)
+
+
+class StagedVisionProcessor:
+
+    def __init__(self, logger, config, usb_drive):
+        self.logger = logger
+        self.config = config
+        self.usb_drive = usb_drive
+        self.workers = []
+        self.connection = None
+
+        # Shared per-stage statistics
+        self.utilization = multiprocessing.Array('d', len(STAGES))
+        self.fps = multiprocessing.Array('d', len(STAGES))
+        self.dropped = [multiprocessing.Value('l', 0) for stage in STAGES]
+        # Frames received by every stage
+        self.received = multiprocessing.Array('l', len(STAGES))
+
+        # Times of the recent restarts of every stage, and the restarted stages
+        # not yet seen working as (restart time, received, captured)
+        self.restart_times = [[] for stage in STAGES]
+        self.restarted = {}
+
+        self.frame_pool = None
+
+    def start(self):
+        """
+        Allocate the shared frame pool and start the stage processes.
+        :return: False if the camera size is unknown
+        """
+
+        if (len(self.config.camera_configs) == 0):
+            return False
+
+        camera_config = self.config.camera_configs[0].config
+        if ("width" not in camera_config or "height" not in camera_config):
+            self.logger.logMessage("Staged pipeline needs the camera width/height")
+            return False
+
+        output_enabled = Constants.ENABLE_CUSTOM_STREAM
+
+        # Every queued item and every stage can hold one slot, plus one being captured
+        depth = Constants.STAGE_QUEUE_DEPTH
+        slot_count = 3 * depth + len(STAGES) + 1
+        self.frame_pool = FramePool(slot_count, camera_config["width"], camera_config["height"])
+
+        detect_queue = StageQueue(depth, self.frame_pool, self.dropped[1])
+        publish_queue = StageQueue(depth, self.frame_pool, self.dropped[2])
+        output_queue = None
+        if (output_enabled):
+            output_queue = StageQueue(depth, self.frame_pool, self.dropped[3])
+
+        if (self.config.server):
+            self.connection = Connection(self.logger, True, self.config.team)
+
+        self.workers = [CaptureStage(self, STAGE_CAPTURE, None, detect_queue),
+                        DetectStage(self, STAGE_DETECT, detect_queue, publish_queue),
+                        PublishStage(self, STAGE_PUBLISH, publish_queue, output_queue)]
+        if (output_enabled):
+            self.workers.append(OutputStage(self, STAGE_OUTPUT, output_queue, None))
+
+        for worker in self.workers:
+            self.logger.logMessage("Starting stage '{}'".format(worker.stage_name))
+            worker.start()
+
+        return True
+
+    def run(self):
+        """
+        Periodically report the utilization of every stage and restart any
+        stage that exits.  All stages are stopped when a stage cannot be
+        restarted.
+        :return: False when the stages were stopped (the process should exit with an error)
+        """
+
+        report_start = time.time()
+        while True:
+            time.sleep(STAGE_CHECK_INTERVAL)
+
+            for i in range(len(self.workers)):
+                if (not self.workers[i].is_alive() and not self.restartStage(i)):
+                    self.stop()
+                    return False
+
+            if (not self.checkRestarted()):
+                self.stop()
+                return False
+
+            if (time.time() - report_start >= Constants.STAGE_REPORT_INTERVAL):
+                report_start = time.time()
+                self.logger.logMessage(self.report())
+
+    def restartStage(self, index):
+        """
+        Restart a stage that exited with the same queues and frame pool.  The
+        frame slots it held are released; the items waiting in its queue are
+        processed by the new process.
+        :return: False if the stage exited too often to be restarted
+        """
+
+        worker = self.workers[index]
+        self.logger.logMessage("Stage '{}' exited with code {}".format(worker.stage_name, worker.exitcode))
+
+        now = time.time()
+        restarts = [restart for restart in self.restart_times[index] if (now - restart < Constants.STAGE_RESTART_WINDOW)]
+        if (len(restarts) >= Constants.STAGE_MAX_RESTARTS):
+            self.logger.logMessage("Stage '{}' exited {} times in {} s, stopping all stages".format(
+                worker.stage_name, len(restarts) + 1, Constants.STAGE_RESTART_WINDOW))
+            return False
+
+        released = self.frame_pool.releaseOwned(worker.stage_index)
+
+        restarted = type(worker)(self, worker.stage_name, worker.input_queue, worker.output_queue)
+        self.logger.logMessage("Restarting stage '{}' ({} frame slots released)".format(worker.stage_name, released))
+        restarted.start()
+
+        self.workers[index] = restarted
+        self.restart_times[index] = restarts + [now]
+        self.restarted[index] = (now, self.received[index], self.received[0])
+
+        return True
+
+    def checkRestarted(self):
+        """
+        Check that the restarted stages receive frames again.  A stage whose
+        queue was left locked by the process that died never does.
+        :return: False if a restarted stage has not received a frame within
+                 STAGE_RESTART_TIMEOUT while the camera delivered frames
+        """
+
+        for (index, (restart_time, received, captured)) in list(self.restarted.items()):
+            name = self.workers[index].stage_name
+            if (self.received[index] != received):
+                self.logger.logMessage("Stage '{}' is running again".format(name))
+                del self.restarted[index]
+            elif (time.time() - restart_time >= Constants.STAGE_RESTART_TIMEOUT and self.received[0] != captured):
+                self.logger.logMessage("Stage '{}' receives no frames after restarting, stopping all stages".format(name))
+                return False
+
+        return True
+
+    def stop(self):
+        """
+        Stop every stage process.
+        """
+
+        for worker in self.workers:
+            if (worker.is_alive()):
+                worker.terminate()
+
+        for worker in self.workers:
+            worker.join(STOP_TIMEOUT)
+
+    def report(self):
+        """
+        Summarize the utilization, frame rate and dropped frames of every stage.
+        The busiest stage limits the throughput.
+        """
+
+        stages = []
+        for i in range(len(self.workers)):
+            stages.append("{} {:.0f}% {:.1f} fps {} dropped".format(
+                STAGES[i], 100 * self.utilization[i], self.fps[i], self.dropped[i].value))
+
+        return "Stage utilization: " + ", ".join(stages)
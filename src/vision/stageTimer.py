@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+
+"""
+----------------------------------------------------------------------------
+Authors:     FRC Team 4145
+
+Description: Per-stage timing instrumentation.  Stage durations are measured
+             with a monotonic high-resolution clock and kept in fixed-size
+             rolling windows; percentiles are only calculated when a summary
+             is requested.
+----------------------------------------------------------------------------
+"""
+
+import time
+import numpy
+
+
+# Columns of the timing summary
+SUMMARY_HEADER = "time,stage,count,p50_ms,p95_ms,p99_ms,max_ms"
+
+
+class StageTimer:
+
+    def __init__(self, window, report_interval):
+        # Number of samples kept per stage
+        self.window = window
+        self.report_interval = report_interval
+
+        # Rolling samples (seconds) and total sample count per stage
+        self.samples = {}
+        self.counts = {}
+
+        self.last_report = time.perf_counter()
+
+    @staticmethod
+    def now():
+        """
+        Current time of the timing clock (seconds).
+        """
+
+        return time.perf_counter()
+
+    def record(self, stage, start):
+        """
+        Record the time since start for a stage.
+        :return: The current time, to be used as the start of the next stage
+        """
+
+        end = time.perf_counter()
+        self.recordDuration(stage, end - start)
+
+        return end
+
+    def recordDuration(self, stage, duration):
+        """
+        Record a duration (seconds) measured elsewhere for a stage.
+        """
+
+        samples = self.samples.get(stage)
+        if (samples is None):
+            samples = [0.0] * self.window
+            self.samples[stage] = samples
+            self.counts[stage] = 0
+
+        count = self.counts[stage]
+        samples[count % self.window] = duration
+        self.counts[stage] = count + 1
+
+    def reset(self):
+        """
+        Discard all recorded samples.
+        """
+
+        self.samples = {}
+        self.counts = {}
+
+    def reportDue(self):
+        """
+        Check if the report interval has passed since the last summary.
+        """
+
+        return time.perf_counter() - self.last_report >= self.report_interval
+
+    def summary(self):
+        """
+        Calculate the p50/p95/p99/max (milliseconds) of every stage.
+        :return: Dictionary of stage name to (count, p50, p95, p99, max)
+        """
+
+        self.last_report = time.perf_counter()
+
+        summary = {}
+        for (stage, samples) in self.samples.items():
+            count = self.counts[stage]
+            values = numpy.array(samples[:min(count, self.window)]) * 1000
+            (p50, p95, p99) = numpy.percentile(values, [50, 95, 99])
+            summary[stage] = (count, p50, p95, p99, values.max())
+
+        return summary
+
+    @staticmethod
+    def formatCsv(summary, timestamp):
+        """
+        Convert a summary to CSV rows (see SUMMARY_HEADER).
+        """
+
+        rows = []
+        for (stage, (count, p50, p95, p99, maximum)) in summary.items():
+            rows.append("{},{},{},{:.3f},{:.3f},{:.3f},{:.3f}".format(timestamp, stage, count, p50, p95, p99, maximum))
+
+        return rows
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+
+"""
+----------------------------------------------------------------------------
+Authors:     FRC Team 4145
+
+Description: Startup timing.  Records when each part of the startup finished
+             (relative to the start of the program) and reports them with the
+             time to the first published result.
+----------------------------------------------------------------------------
+"""
+
+import time
+
+
+class StartupReport:
+
+    def __init__(self, logger, start_time, usb_drive=None):
+        self.logger = logger
+        # Time (time.monotonic) the program started
+        self.start_time = start_time
+        self.usb_drive = usb_drive
+
+        # Milestone name -> seconds after the start (in the order reached)
+        self.milestones = {}
+        self.reported = False
+
+    def mark(self, name, when=None):
+        """
+        Record a milestone (the first time only).
+        :param when: Time (time.monotonic) of the milestone, now if None
+        """
+
+        if (name not in self.milestones):
+            if (when is None):
+                when = time.monotonic()
+            self.milestones[name] = when - self.start_time
+
+    def report(self, connection):
+        """
+        Log the milestones and publish the time (milliseconds) to the first
+        published result.
+        """
+
+        if (self.reported):
+            return
+        self.reported = True
+
+        # The USB drive may still be mounting
+        usb_state = ""
+        if (self.usb_drive is not None):
+            if (self.usb_drive.ready_time is None):
+                usb_state = ", usb still starting"
+            else:
+                self.mark("usb", self.usb_drive.ready_time)
+
+        milestones = sorted(self.milestones.items(), key=lambda item: item[1])
+        self.logger.logMessage("Startup: " + ", ".join("{} {:.0f} ms".format(name, seconds * 1000)
+                                                       for (name, seconds) in milestones) + usb_state)
+
+        first_result = self.milestones.get("first_result")
+        if (connection is not None and first_result is not None):
+            connection.publishValue("startup_time", first_result * 1000)
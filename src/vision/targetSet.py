@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+
+"""
+----------------------------------------------------------------------------
+Authors:     FRC Team 4145
+
+Description: Several target types found in the same frame.  Each named target
+             in TARGETS_FILE gets its own pipeline (the default parameters
+             with the target's values), and its results are published under
+             a sub table of the same name.  The pipelines share a FrameCache,
+             so the HSV conversion and downscaled copies of a frame are made
+             once for all targets.
+
+Comments:    Target parameters use the names of the live tuning parameters,
+             e.g. {"targets": {"cargo": {"hsv_threshold_hue": [5, 25]}}}.
+----------------------------------------------------------------------------
+"""
+
+import json
+from .frameCache import FrameCache
+from .pipeline import Pipeline
+from .pipelineTuner import PipelineTuner, TUNABLE_PARAMETERS
+
+
+class Target:
+
+    def __init__(self, name, pipeline, connection):
+        self.name = name
+        self.pipeline = pipeline
+        # Connection publishing under the target's sub table (None offline)
+        self.connection = connection
+        # Timer stage of the target
+        self.stage = "target_" + name
+
+
+class TargetSet:
+
+    def __init__(self, logger, connection, pipeline):
+        """
+        Args:
+            pipeline: The pipeline of the main target, which shares the frame cache.
+        """
+
+        self.logger = logger
+        self.connection = connection
+
+        self.frame_cache = FrameCache()
+        pipeline.frame_cache = self.frame_cache
+
+        # Additional targets, in file order
+        self.targets = []
+
+    @staticmethod
+    def loadTargets(path):
+        """
+        Load the target parameters from a JSON file.
+        :return: List of (name, parameters) with the values converted to the pipeline types
+        """
+
+        with open(path, "r") as file:
+            description = json.load(file)
+
+        targets = []
+        for (name, params) in description["targets"].items():
+            values = {}
+            for (param, value) in params.items():
+                if (param not in TUNABLE_PARAMETERS):
+                    raise ValueError("Unknown parameter '{}' for target '{}'".format(param, name))
+
+                values[param] = PipelineTuner.convertValue(param, value)
+                if (values[param] is None):
+                    raise ValueError("Invalid value for {} of target '{}': {}".format(param, name, value))
+
+            targets.append((name, values))
+
+        return targets
+
+    def load(self, path):
+        """
+        Create a pipeline for each target of a file.
+        :return: True if the targets were loaded
+        """
+
+        try:
+            targets = self.loadTargets(path)
+        except (OSError, ValueError, KeyError) as error:
+            self.logger.logMessage("Could not load targets from {}: {}".format(path, error))
+            return False
+
+        for (name, values) in targets:
+            self.addTarget(name, values)
+
+        self.logger.logMessage("Finding {} additional targets: {}".format(
+            len(self.targets), ", ".join(target.name for target in self.targets)))
+
+        return True
+
+    def addTarget(self, name, values):
+        """
+        Add a target found with the default pipeline parameters changed by values.
+        """
+
+        pipeline = Pipeline()
+        for (param, value) in values.items():
+            setattr(pipeline, param, value)
+        pipeline.invalidate(list(values))
+        pipeline.frame_cache = self.frame_cache
+
+        connection = None
+        if (self.connection is not None):
+            connection = self.connection.targetConnection(name)
+
+        self.targets.append(Target(name, pipeline, connection))
+
+    def startFrame(self, frame_time, sequence):
+        """
+        Forget the images of the last frame and set the frame of every target's results.
+        """
+
+        self.frame_cache.reset()
+
+        for target in self.targets:
+            target.pipeline.frame_time = frame_time
+            target.pipeline.frame_sequence = sequence
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+
+"""
+----------------------------------------------------------------------------
+Authors:     FRC Team 4145
+
+Description: Tracks targets between full detections.  The box corners of
+             each target are followed with sparse (Lucas-Kanade) optical flow
+             on a small grayscale window around the targets, and each target
+             is moved by the mean motion of its corners.  Tracking gives up
+             (so the next frame runs a full detection) when the corners cannot
+             be tracked forwards and back to where they started.
+----------------------------------------------------------------------------
+"""
+
+import cv2
+import numpy
+from .bufferPool import BufferPool
+from .constants import Constants
+from .contourFeatures import ContourData
+
+
+# Number of tracked points (box corners) per target
+CORNER_COUNT = 4
+
+# Lucas-Kanade search window size and pyramid levels
+FLOW_WINDOW = (21, 21)
+FLOW_LEVELS = 2
+
+
+class TargetTracker:
+
+    def __init__(self, logger):
+        self.logger = logger
+        self.buffer_pool = BufferPool()
+
+        # Targets and corner points of the last frame (None when not tracking)
+        self.contour_data = None
+        self.points = None
+
+        # Grayscale window of the last frame and its position (x, y, width, height)
+        self.previous = None
+        self.window = None
+        self.buffer_index = 0
+
+        # Frames since the last full detection
+        self.frame_count = 0
+
+        # Detected and tracked frame counts since the last report
+        self.detected_count = 0
+        self.tracked_count = 0
+
+    def detectionDue(self):
+        """
+        Check if the next frame needs a full detection.
+        """
+
+        return (self.points is None or self.frame_count >= Constants.TRACK_DETECT_INTERVAL)
+
+    def start(self, frame, contour_data):
+        """
+        Start tracking the targets found by a full detection.
+        """
+
+        self.detected_count += 1
+        self.frame_count = 1
+
+        if (len(contour_data) == 0):
+            self.contour_data = None
+            self.points = None
+            return
+
+        self.contour_data = contour_data
+        self.points = numpy.concatenate([contour.box[0] for contour in contour_data]).astype(numpy.float32)
+        self.saveWindow(frame)
+
+    def track(self, frame, frame_time, sequence):
+        """
+        Move the targets of the last frame to the new frame.
+        :return: The list of tracked ContourData, or None if tracking was lost
+        """
+
+        current = self.convertWindow(frame, self.window)
+
+        # Track forwards, then back to check the points return to where they started
+        offset = numpy.array(self.window[:2], dtype=numpy.float32)
+        start = (self.points - offset).reshape(-1, 1, 2)
+        (moved, status, error) = cv2.calcOpticalFlowPyrLK(self.previous, current, start, None,
+                                                          winSize=FLOW_WINDOW, maxLevel=FLOW_LEVELS)
+        (returned, back_status, error) = cv2.calcOpticalFlowPyrLK(current, self.previous, moved, None,
+                                                                  winSize=FLOW_WINDOW, maxLevel=FLOW_LEVELS)
+
+        distance = numpy.linalg.norm((returned - start).reshape(-1, 2), axis=1)
+        valid = (status.reshape(-1) == 1) & (back_status.reshape(-1) == 1) & (distance < Constants.TRACK_MAX_ERROR)
+
+        # Every target needs all but one corner tracked
+        valid = valid.reshape(-1, CORNER_COUNT)
+        valid_count = valid.sum(axis=1)
+        if ((valid_count < CORNER_COUNT - 1).any()):
+            self.stop()
+            return None
+
+        # Mean motion of the valid corners of each target
+        motion = (moved - start).reshape(-1, CORNER_COUNT, 2) * valid[:, :, numpy.newaxis]
+        motion = motion.sum(axis=1) / valid_count[:, numpy.newaxis]
+
+        # Move the feature table rows of the targets
+        features = self.contour_data[0].features.moved([contour.index for contour in self.contour_data], motion)
+        contour_data = [ContourData(features, index, frame_time, sequence, True) for index in range(len(features))]
+
+        self.contour_data = contour_data
+        self.points = numpy.concatenate([contour.box[0] for contour in contour_data]).astype(numpy.float32)
+
+        # Keep the window until the targets get close to its edge
+        if (self.nearEdge(frame)):
+            self.saveWindow(frame)
+        else:
+            self.previous = current
+
+        self.frame_count += 1
+        self.tracked_count += 1
+
+        return contour_data
+
+    def stop(self):
+        """
+        Stop tracking (the next frame runs a full detection).
+        """
+
+        self.contour_data = None
+        self.points = None
+
+    def convertWindow(self, frame, window):
+        """
+        Convert a window of the frame to grayscale.  Two buffers are used in
+        turn so the previous window stays valid.
+        """
+
+        (x, y, width, height) = window
+        self.buffer_index = 1 - self.buffer_index
+        gray = self.buffer_pool.get("gray{}".format(self.buffer_index), (height, width))
+        cv2.cvtColor(frame[y:y + height, x:x + width], cv2.COLOR_BGR2GRAY, dst=gray)
+
+        return gray
+
+    def nearEdge(self, frame):
+        """
+        Check if a point is closer than half the padding to an edge of the
+        window (that is not an edge of the frame).
+        """
+
+        (x, y, width, height) = self.window
+        (frame_height, frame_width) = frame.shape[:2]
+        (min_x, min_y) = self.points.min(axis=0)
+        (max_x, max_y) = self.points.max(axis=0)
+        margin = Constants.TRACK_PADDING // 2
+
+        return ((x > 0 and min_x - x < margin) or (y > 0 and min_y - y < margin) or
+                (x + width < frame_width and x + width - max_x < margin) or
+                (y + height < frame_height and y + height - max_y < margin))
+
+    def saveWindow(self, frame):
+        """
+        Select the window around the current points and keep it for the next
+        frame.
+        """
+
+        (frame_height, frame_width) = frame.shape[:2]
+        (min_x, min_y) = self.points.min(axis=0)
+        (max_x, max_y) = self.points.max(axis=0)
+
+        padding = Constants.TRACK_PADDING
+        left = min(max(int(min_x) - padding, 0), frame_width - 1)
+        top = min(max(int(min_y) - padding, 0), frame_height - 1)
+        right = max(min(int(max_x) + padding + 1, frame_width), left + 1)
+        bottom = max(min(int(max_y) + padding + 1, frame_height), top + 1)
+
+        self.window = (left, top, right - left, bottom - top)
+        self.previous = self.convertWindow(frame, self.window)
+
+    def report(self):
+        """
+        Log the fraction of frames that were tracked instead of detected.
+        """
+
+        total = self.detected_count + self.tracked_count
+        if (total >= Constants.TRACK_REPORT_INTERVAL):
+            self.logger.logMessage("Target tracking: {:.1f}% of frames tracked".format(100.0 * self.tracked_count / total))
+            self.detected_count = 0
+            self.tracked_count = 0
@@ -13,8 +13,15 @@ Description: This script uses a generated CV2 pipeline to process a camera
 import subprocess
 import os
 import datetime
-from cv2 import imwrite
+import atexit
+import multiprocessing
+import threading
+import time
+from .blackBox import BlackBox
 from .constants import Constants
+from .imageWriter import ImageWriter
+from .logWriter import LogWriter
+from .stageTimer import SUMMARY_HEADER
 
 
 # USB Related directories/files
@@ -22,15 +29,47 @@ USB_ROOT_PATH = "/dev/sda"
 USB_MOUNT_DIR = "/media/usb0"
 IMAGE_DIR = USB_MOUNT_DIR + "/images"
 LOG_FILE = "log.txt"
+TIMING_FILE = "timing.csv"
+# Log lines kept while the drive is starting
+EARLY_LOG_LINES = 1000
+BLACKBOX_FILE = "blackbox.ring"
 
 
 class UsbDrive:
 
     today_dir = None
     frame_index = 0
+    image_writer = None
+    log_writer = None
+    timing_writer = None
+    black_box = None
+    # Process that owns the writer threads
+    writer_pid = None
+    # Time (time.monotonic) the drive finished starting (None while starting)
+    ready_time = None
+
+    def __init__(self, background=False):
+        # Log lines written before the log writer starts
+        self.early_lines = []
+        self.lock = threading.Lock()
+
+        # Mount in the background so the camera does not wait for the drive
+        self.starter = None
+        if (background):
+            self.starter = threading.Thread(target=self.startUsbDrive, name="UsbDrive", daemon=True)
+            self.starter.start()
+        else:
+            self.startUsbDrive()
+
+        atexit.register(self.close)
+
+    def waitForStart(self, timeout=None):
+        """
+        Wait for a background start to finish.
+        """
 
-    def __init__(self):
-        self.startUsbDrive()
+        if (self.starter is not None):
+            self.starter.join(timeout)
 
     def startUsbDrive(self):
         """
@@ -67,9 +106,16 @@ class UsbDrive:
                     self.makeDirectory(self.today_dir)
                 else:
                     print("Using Directory: " + self.today_dir)
+
+                # Write images and logs in the background
+                self.startWriters()
         else:
             print('No USB device found')
 
+        with self.lock:
+            self.early_lines = []
+            self.ready_time = time.monotonic()
+
     def getUsbPath(self):
         """
         Get the path of the last USB drive inserted.
@@ -116,37 +162,160 @@ class UsbDrive:
         for out in output:
             print(out, end="")
 
+    def startWriters(self):
+        """
+        Start the background image and log writers for this process.
+        """
+
+        # Worker processes log to their own file
+        log_file = LOG_FILE
+        process = multiprocessing.current_process()
+        if (process.name != "MainProcess"):
+            log_file = "log-" + process.name + ".txt"
+
+        self.image_writer = ImageWriter(Constants.IMAGE_QUEUE_SIZE, Constants.IMAGE_DROP_POLICY)
+        self.image_writer.start()
+
+        log_writer = LogWriter(self.today_dir + "/" + log_file, Constants.LOG_FLUSH_INTERVAL,
+                               Constants.LOG_FLUSH_SIZE, Constants.LOG_MAX_BYTES, Constants.LOG_BACKUP_COUNT)
+        log_writer.start()
+
+        # Write the lines logged while the drive was starting
+        with self.lock:
+            for line in self.early_lines:
+                log_writer.write(line)
+            self.early_lines = []
+            self.log_writer = log_writer
+
+        timing_file = self.today_dir + "/" + TIMING_FILE
+        if (process.name != "MainProcess"):
+            timing_file = self.today_dir + "/timing-" + process.name + ".csv"
+        self.timing_writer = LogWriter(timing_file, Constants.LOG_FLUSH_INTERVAL, Constants.LOG_FLUSH_SIZE,
+                                       Constants.LOG_MAX_BYTES, Constants.LOG_BACKUP_COUNT)
+        if (not os.path.exists(timing_file)):
+            self.timing_writer.write(SUMMARY_HEADER + "\n")
+        self.timing_writer.start()
+
+        # The ring file is reused across days (it is created once at full size)
+        if (Constants.ENABLE_BLACK_BOX):
+            ring_file = USB_MOUNT_DIR + "/" + BLACKBOX_FILE
+            if (process.name != "MainProcess"):
+                ring_file = USB_MOUNT_DIR + "/blackbox-" + process.name + ".ring"
+            self.black_box = BlackBox(self, ring_file, self.today_dir, Constants.BLACKBOX_SIZE_MB * 1024 * 1024,
+                                      Constants.BLACKBOX_SCALE)
+
+        self.writer_pid = os.getpid()
+
+    def checkWriters(self):
+        """
+        Restart the writers in a forked worker process (threads are not copied by fork).
+        """
+
+        if (self.writer_pid is not None and self.writer_pid != os.getpid()):
+            self.startWriters()
+
+    def close(self):
+        """
+        Flush the buffered log and the queued images.
+        """
+
+        if (self.writer_pid != os.getpid()):
+            return
+
+        if (self.log_writer is not None):
+            self.log_writer.close()
+
+        if (self.timing_writer is not None):
+            self.timing_writer.close()
+
+        if (self.image_writer is not None):
+            self.image_writer.stop()
+
     def logMessage(self, message):
         """
-        Output to log file on USB and print to console.
+        Buffer a line for the log file on USB.
         """
 
-        if (self.today_dir != None):
-            log = self.today_dir + "/" + LOG_FILE
-            now = datetime.datetime.now()
-            time = now.strftime("%H-%M-%S")
-            line = time + ": " + message + "\n"
+        # No USB drive
+        if (self.log_writer is None and self.ready_time is not None):
+            return
+
+        now = datetime.datetime.now()
+        line = now.strftime("%H-%M-%S") + ": " + message + "\n"
 
-            file = open(log, "a+")
-            file.write(line)
-            file.flush()
-            file.close()
+        if (self.log_writer is None and self.ready_time is None):
+            # Keep the line until the log writer starts
+            with self.lock:
+                if (self.log_writer is None and self.ready_time is None):
+                    if (len(self.early_lines) < EARLY_LOG_LINES):
+                        self.early_lines.append(line)
+                    return
 
-    def saveFrame(self, frame):
+        if (self.log_writer != None):
+            self.checkWriters()
+
+            self.log_writer.write(line)
+
+    def logTiming(self, rows):
+        """
+        Append timing summary rows to the timing CSV.
+        """
+
+        if (self.timing_writer != None):
+            self.checkWriters()
+
+            for row in rows:
+                self.timing_writer.write(row + "\n")
+
+    def saveFrame(self, frame, contour_data=()):
         """
-        Save the frame to the USB drive.
+        Queue the frame to be saved to the USB drive (one in FRAME_INTERVAL).
+        :param contour_data: Targets whose boxes are drawn on the saved image
         """
 
         name = None
         write = False
-        if (self.today_dir != None and self.frame_index % Constants.FRAME_INTERVAL == 0):
+        if (self.image_writer != None and self.frame_index % Constants.FRAME_INTERVAL == 0):
+            self.checkWriters()
+
             now = datetime.datetime.now()
             name = self.today_dir + "/" + now.strftime("%H-%M-%S") + ".jpeg"
 
-            write = imwrite(name, frame)
+            write = self.image_writer.submit(name, frame, [contour.box[0] for contour in contour_data])
 
             self.frame_index = 0
 
         self.frame_index += 1
 
         return (name, write)
+
+    def recordFrame(self, frame, frame_time, sequence, contour_data):
+        """
+        Record the frame and its results in the black box.
+        """
+
+        if (self.black_box != None):
+            self.checkWriters()
+
+            self.black_box.record(frame, frame_time, sequence, contour_data)
+
+    def triggerBlackBox(self, reason):
+        """
+        Save the last seconds of the black box recording.
+        :return: True if a save was started
+        """
+
+        if (self.black_box is None):
+            return False
+
+        return self.black_box.trigger(reason, Constants.BLACKBOX_TRIGGER_SECONDS)
+
+    def getImageStats(self):
+        """
+        Get the queued/written/dropped counters of the image writer.
+        """
+
+        if (self.image_writer is None):
+            return None
+
+        return self.image_writer.getStats()
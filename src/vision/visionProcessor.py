@@ -9,35 +9,86 @@ Description: This script uses a generated CV2 pipeline to process a camera
 ----------------------------------------------------------------------------
 """
 
+import os
 import time
 import numpy as np
 import cv2
 import json
-from . import CameraHost, Connection, Constants, Pipeline, Logger
-
-
-class ContourData:
-    def __init__(self, cx, cy, box):
-        # X coordinate of the contour center
-        self.cx = cx
-        # Y coordinate of the contour center
-        self.cy = cy
-        # Minimum containing box of contour
-        self.box = box
-
-    # Convert contour data to string
-    def __str__(self):
-        return '{cx: ' + str(self.cx) + ', cy: ' + str(self.cy) + '}'
+from . import (CameraFrameSource, CameraHost, Connection, Constants, ContourData, DashboardStream, FrameSource, LatencyController, Pipeline, Logger,
+               PipelineTuner, PyramidDetector, RoiTracker, StageTimer, TargetSet, TargetTracker)
+from .roiTracker import MODE_FULL, MODE_ROI, MODE_ROI_MISS
 
 
 class VisionProcessor:
 
-    def __init__(self, logger: Logger, connection: Connection, camera_host: CameraHost):
+    def __init__(self, logger: Logger, connection: Connection, camera_host: CameraHost, frame_source: FrameSource = None):
         self.logger = logger
         self.connection = connection
         self.camera_host = camera_host
         self.pipeline = Pipeline()
 
+        # Read frames from the camera unless another source is given
+        self.frame_source = frame_source
+        if (frame_source is None and camera_host is not None):
+            self.frame_source = CameraFrameSource(camera_host)
+
+        # Coarse-to-fine detection
+        self.pyramid_detector = None
+        if (Constants.ENABLE_PYRAMID_DETECTION):
+            self.pyramid_detector = PyramidDetector(logger, Constants.PYRAMID_SCALE)
+
+        # Draw and send the custom stream on its own thread
+        self.dashboard_stream = None
+        if (Constants.ENABLE_CUSTOM_STREAM and Constants.ENABLE_DASHBOARD_STREAM and
+                camera_host is not None and camera_host.cv_source is not None):
+            self.dashboard_stream = DashboardStream(logger, camera_host, Constants.STREAM_SCALE, Constants.STREAM_MAX_FPS)
+            self.dashboard_stream.start()
+
+        # Region-of-interest tracking
+        self.roi_tracker = RoiTracker(logger)
+        self.last_contour_data = []
+
+        # Full detection every few frames with targets tracked in between
+        self.target_tracker = None
+        if (Constants.ENABLE_TARGET_TRACKING):
+            self.target_tracker = TargetTracker(logger)
+
+        # Frame rate reporting
+        self.fps_frame_count = 0
+        self.fps_start = time.time()
+
+        # Per-stage timing (also used for capture-to-publish latency)
+        self.timer = None
+        if (Constants.ENABLE_STAGE_TIMING):
+            self.timer = StageTimer(Constants.TIMING_WINDOW, Constants.TIMING_REPORT_INTERVAL)
+            self.pipeline.timer = self.timer
+
+        # Live tuning of the pipeline parameters
+        self.tuner = None
+        if (Constants.ENABLE_LIVE_TUNING and connection is not None):
+            self.tuner = PipelineTuner(logger, connection, self.pipeline)
+            if (not self.tuner.start()):
+                self.tuner = None
+
+        # Degrade processing when frames exceed the latency budget
+        self.latency_controller = None
+        if (Constants.ENABLE_LATENCY_CONTROL):
+            self.latency_controller = LatencyController(logger, connection, Constants.LATENCY_BUDGET)
+
+        # Additional target types found in the same frame
+        self.target_set = None
+        if (Constants.ENABLE_MULTI_TARGET):
+            self.target_set = TargetSet(logger, connection, self.pipeline)
+            if (not self.target_set.load(os.path.join(os.path.dirname(__file__), Constants.TARGETS_FILE))):
+                self.target_set = None
+                self.pipeline.frame_cache = None
+
+        # Frames without targets since targets were last seen (None before any were seen)
+        self.lost_frames = None
+
+        # Startup timing, reported with the first published result (set by main)
+        self.startup_report = None
+
     def processFrame(self, frame, pipeline: Pipeline):
         """
         Performs extra processing on the pipeline's outputs.
@@ -49,7 +100,16 @@ class VisionProcessor:
 
         try:
             # Process the CV2 Pipeline
-            pipeline.process(frame)
+            scale = 1
+            if (self.latency_controller is not None):
+                scale = self.latency_controller.processScale()
+
+            if (scale > 1):
+                pipeline.process_scaled(frame, scale)
+            elif (self.pyramid_detector is not None):
+                self.pyramid_detector.process(frame, pipeline)
+            else:
+                pipeline.process(frame)
 
             # Populate data from contours
             contour_data = self.calculateContourData(pipeline)
@@ -59,56 +119,171 @@ class VisionProcessor:
 
         return contour_data
 
-    def calculateContourData(self, pipeline: Pipeline):
+    def processTrackedFrame(self, frame, pipeline: Pipeline):
         """
-        Populate the various contour data used in future caluculations.
+        Process only the region around the previous targets, falling back to the
+        full frame when the targets are lost or a full search is due.
+        :return: Tuple of (contour_data, mode)
         """
+
+        start = time.time()
+        mode = MODE_FULL
         contour_data = []
 
-        # Find the bounding boxes of the contours to get x, y, width, and height
-        for contour in pipeline.filter_contours_output:
-            # Find the centers of mass of the contours
-            # https://docs.opencv.org/3.4.2/dd/d49/tutorial_py_contour_features.html
+        (height, width) = frame.shape[:2]
+        window = self.roi_tracker.selectWindow(self.last_contour_data, width, height)
+
+        if (window is not None):
+            cut_off = 0
+            try:
+                cut_off = pipeline.process_region(frame, *window)
+                contour_data = self.calculateContourData(pipeline)
+                mode = MODE_ROI
+            except (ZeroDivisionError):
+                self.logger.logMessage("Divide by 0 exception in Pipeline")
+
+            # Target lost or cut off by the window, search the full frame
+            if (len(contour_data) == 0 or cut_off > 0):
+                mode = MODE_ROI_MISS
+
+        if (mode != MODE_ROI):
+            contour_data = self.processFrame(frame, pipeline)
+
+        self.last_contour_data = contour_data
+        self.roi_tracker.recordFrame(mode, time.time() - start)
+
+        return (contour_data, mode)
+
+    def detectTargets(self, frame, pipeline: Pipeline):
+        """
+        Run a full detection (searching around the previous targets when
+        region-of-interest tracking is enabled).
+        """
+
+        if (Constants.ENABLE_ROI_TRACKING):
+            (contour_data, mode) = self.processTrackedFrame(frame, pipeline)
+            self.connection.publishValue("frame_mode", mode)
+            return contour_data
+
+        return self.processFrame(frame, pipeline)
+
+    def processTrackedTargets(self, frame, pipeline: Pipeline, frame_time, sequence):
+        """
+        Track the targets from the previous frame, running a full detection
+        every TRACK_DETECT_INTERVAL frames or when tracking is lost.
+        """
 
-            moments = cv2.moments(contour)
-            m00 = moments['m00']
-            if (m00 != 0):
-                cx = int(moments['m10'] / m00)
-                cy = int(moments['m01'] / m00)
+        tracker = self.target_tracker
+        contour_data = None
 
-                box = self.calculateBox(contour)
+        if (not tracker.detectionDue()):
+            if (self.timer is not None):
+                start = self.timer.now()
 
-                contour_data.append(ContourData(cx, cy, box))
+            contour_data = tracker.track(frame, frame_time, sequence)
+
+            if (self.timer is not None):
+                self.timer.record("track", start)
+
+        if (contour_data is None):
+            contour_data = self.detectTargets(frame, pipeline)
+            tracker.start(frame, contour_data)
+        else:
+            # The ROI search window follows the tracked targets
+            self.last_contour_data = contour_data
+
+        self.connection.publishValue("tracked", len(contour_data) > 0 and contour_data[0].tracked)
+        tracker.report()
 
         return contour_data
 
-    def calculateBox(self, contour):
+    def processTargets(self, frame):
         """
-        Calculate the minimum containing box of the contour
+        Find and publish the additional target types in the frame the main
+        target was found in.
         """
 
-        rect = cv2.minAreaRect(contour)
-        box = cv2.boxPoints(rect)
-        box = np.int0(box)
+        timer = self.timer
+        for target in self.target_set.targets:
+            if (timer is not None):
+                start = timer.now()
+
+            contour_data = self.processFrame(frame, target.pipeline)
+            if (target.connection is not None):
+                target.connection.publishValues(contour_data, target.pipeline.frame_time, target.pipeline.frame_sequence)
 
-        return [box]
+            if (timer is not None):
+                timer.record(target.stage, start)
 
-    def writeFrame(self, frame, contour_data):
+    def calculateContourData(self, pipeline: Pipeline):
+        """
+        Populate the various contour data used in future caluculations.
+        """
+        if (self.timer is not None):
+            start = self.timer.now()
+
+        # Moments and minimum containing boxes of all contours at once
+        # https://docs.opencv.org/3.4.2/dd/d49/tutorial_py_contour_features.html
+        features = pipeline.filter_contours_features
+        features.measure()
+
+        contour_data = [ContourData(features, index, pipeline.frame_time, pipeline.frame_sequence)
+                        for (index, m00) in enumerate(features.m00.tolist()) if (m00 != 0)]
+
+        if (self.timer is not None):
+            self.timer.record("calculateContourData", start)
+
+        return contour_data
+
+    def writeFrame(self, frame, contour_data, stream=True):
         """
         Ouput vision frame with custom overlays
+        :param stream: Output the frame to the custom stream
         """
 
         # Draw blue border surrounding contours
         if (Constants.ENABLE_CUSTOM_STREAM):
-            for contour in contour_data:
-                cv2.drawContours(frame, contour.box, -1, (255, 0, 0), 2)
+            # Boxes still to be drawn on the saved image
+            overlay = contour_data
+
+            # The dashboard stream draws its own overlay on a downscaled copy
+            dashboard_stream = self.dashboard_stream
+            if (dashboard_stream is not None):
+                if (stream):
+                    dashboard_stream.submit(frame, contour_data)
+            elif (stream and self.camera_host is not None):
+                # Recorded frame sources hand out read-only frames
+                if (not frame.flags.writeable):
+                    frame = frame.copy()
+
+                for contour in contour_data:
+                    cv2.drawContours(frame, contour.box, -1, (255, 0, 0), 2)
+                overlay = []
+
+                # Output frame to camera stream
+                self.camera_host.outputVisionFrame(frame)
+
+            # Save frame to USB drive (the overlay is drawn on the writer's copy, only for saved frames)
+            if (Constants.ENABLE_IMAGE_SAVE):
+                self.logger.saveFrame(frame, overlay)
 
-            # Output frame to camera stream
-            self.camera_host.outputVisionFrame(frame)
+    def recordFrame(self, frame, frame_time, sequence, contour_data):
+        """
+        Record the frame in the black box and save the recording when the
+        robot asks for it or the targets are lost.
+        """
 
-            # Save frame to USB drive
-            if (Constants.ENABLE_IMAGE_SAVE):
-                self.logger.saveFrame(frame)
+        self.logger.recordFrame(frame, frame_time, sequence, contour_data)
+
+        if (self.connection is not None and self.connection.consumeFlag("blackbox_trigger")):
+            self.logger.triggerBlackBox("requested")
+
+        if (len(contour_data) > 0):
+            self.lost_frames = 0
+        elif (self.lost_frames is not None):
+            self.lost_frames += 1
+            if (self.lost_frames == Constants.BLACKBOX_LOSS_FRAMES and Constants.BLACKBOX_TRIGGER_ON_LOSS):
+                self.logger.triggerBlackBox("targets lost")
 
     def processVision(self):
         """
@@ -117,14 +292,128 @@ class VisionProcessor:
 
         start = time.time()
 
-        frame = self.camera_host.readVisionFrame()
-        if (frame is not None):
-            contour_data = self.processFrame(frame, self.pipeline)
+        # Apply tuned parameters between frames
+        if (self.tuner is not None and self.tuner.applyPending()):
+            # Targets found with the old parameters are not a valid search region
+            self.last_contour_data = []
 
-            self.connection.publishValues(contour_data)
+        (frame, frame_time, sequence) = self.frame_source.readFrame()
 
-            self.writeFrame(frame, contour_data)
+        controller = self.latency_controller
+        if (frame is not None and controller is not None and controller.skipFrame()):
+            frame = None
+
+        if (frame is not None):
+            process_start = time.perf_counter()
+            read_time = time.monotonic()
+
+            # Results carry the capture time and sequence of their frame
+            self.pipeline.frame_time = frame_time
+            self.pipeline.frame_sequence = sequence
+            if (self.target_set is not None):
+                self.target_set.startFrame(frame_time, sequence)
+
+            timer = self.timer
+            if (timer is not None):
+                frame_start = timer.now()
+
+            if (self.target_tracker is not None):
+                contour_data = self.processTrackedTargets(frame, self.pipeline, frame_time, sequence)
+            else:
+                contour_data = self.detectTargets(frame, self.pipeline)
+
+            if (timer is not None):
+                stage_start = timer.now()
+
+            self.connection.publishValues(contour_data, frame_time, sequence)
+            if (self.startup_report is not None):
+                self.reportStartup(read_time)
+            if (timer is not None):
+                stage_start = timer.record("publish", stage_start)
+                if (Constants.ENABLE_LATENCY_TRACKING):
+                    self.recordLatency(frame_time, read_time)
+
+            # The main target is published first, the others reuse its intermediates
+            if (self.target_set is not None):
+                self.processTargets(frame)
+                if (timer is not None):
+                    stage_start = timer.now()
+
+            # Record before the overlay is drawn on the frame
+            if (Constants.ENABLE_BLACK_BOX):
+                self.recordFrame(frame, frame_time, sequence, contour_data)
+                if (timer is not None):
+                    stage_start = timer.record("blackbox", stage_start)
+
+            self.writeFrame(frame, contour_data, controller is None or controller.streamEnabled())
+            if (timer is not None):
+                timer.record("writeFrame", stage_start)
+                timer.record("total", frame_start)
+
+                if (timer.reportDue()):
+                    self.reportTiming()
+
+            if (controller is not None):
+                controller.recordFrame(time.perf_counter() - process_start)
+
+            self.reportFps()
 
         end = time.time()
 
         self.logger.logMessage('Frame process time: ' + str(end - start) + ' s\n', True)
+
+    def reportStartup(self, read_time):
+        """
+        Report the startup timing after the first published result.
+        """
+
+        self.startup_report.mark("first_frame", read_time)
+        self.startup_report.mark("first_result", self.connection.publish_time)
+        self.startup_report.report(self.connection)
+        self.startup_report = None
+
+    def recordLatency(self, frame_time, read_time):
+        """
+        Record the camera delay (capture to read) and the processing delay
+        (read to publish) of a frame with the stage timings.
+        """
+
+        publish_time = self.connection.publish_time
+        self.timer.recordDuration("latency_processing", publish_time - read_time)
+
+        # The connection's frame clock logs frames whose age cannot be computed
+        camera_delay = self.connection.frame_clock.frameAge(frame_time, read_time)
+        if (camera_delay is None):
+            return
+
+        self.timer.recordDuration("latency_camera", camera_delay)
+        self.timer.recordDuration("latency_total", camera_delay + publish_time - read_time)
+
+    def reportTiming(self):
+        """
+        Publish the per-stage timing summary and append it to the timing CSV.
+        """
+
+        summary = self.timer.summary()
+
+        for (stage, (count, p50, p95, p99, maximum)) in summary.items():
+            self.connection.publishValue("timing_" + stage, [p50, p95, p99, maximum])
+
+        self.logger.logTiming(StageTimer.formatCsv(summary, time.strftime("%H:%M:%S")))
+
+    def reportFps(self):
+        """
+        Count processed frames and periodically publish the frame rate.
+        """
+
+        self.fps_frame_count += 1
+
+        now = time.time()
+        elapsed = now - self.fps_start
+        if (elapsed >= Constants.FPS_REPORT_INTERVAL):
+            fps = self.fps_frame_count / elapsed
+            self.connection.publishValue("fps", fps)
+            self.logger.logMessage("FPS: {:.1f}".format(fps))
+
+            self.fps_frame_count = 0
+            self.fps_start = now